@@ -10,45 +10,50 @@ Data: ../data/24eoextract990.csv (IRS SOI annual extract, returns filed CY2024)
 https://www.irs.gov/statistics/soi-tax-stats-annual-extract-of-tax-exempt-organization-financial-data
 
 Same filters as the parent post: latest tax period per EIN; FASB reconciliation
-(Part X lines 27+28+29 == line 33 within $1K); positive cash expenses.
+(Part X lines 27+28+29 == line 33 within $1K); positive cash expenses. The
+filters and the ratios below live in ../soilib/reserve.py.
 
   honest      = (line27 - line10c + line23) / (cash expenses / 12)
   honest_bond =  honest with line20 (tax-exempt bonds) added back
   cashmonths  = (line1 + line2) / (cash expenses / 12)   # literal cash on hand
+
+`python3 compute.py --explore` also runs what the spec does not check: the
+headline figures swept over the definitions' choices (soilib/sweep.py),
+printed and written to sensitivity.csv.
 """
 
-import pandas as pd
+import pathlib
+import sys
+
 import numpy as np
 
-COLS = ["EIN", "tax_pd", "subseccd", "totfuncexpns", "deprcatndepletn",
-        "unrstrctnetasstsend", "temprstrctnetasstsend", "permrstrctnetasstsend",
-        "lndbldgsequipend", "secrdmrtgsend", "txexmptbndsend", "totnetassetend",
-        "nonintcashend", "svngstempinvend"]
-
-df = pd.read_csv("../data/24eoextract990.csv", usecols=COLS)
-df = df.sort_values("tax_pd").drop_duplicates("EIN", keep="last")
-fasb = (df.unrstrctnetasstsend + df.temprstrctnetasstsend
-        + df.permrstrctnetasstsend - df.totnetassetend).abs() <= 1000
-df["cashexp"] = df.totfuncexpns - df.deprcatndepletn
-df = df[fasb & (df.cashexp > 0)].copy()
-
-df["honest"] = (df.unrstrctnetasstsend - df.lndbldgsequipend
-                + df.secrdmrtgsend) / (df.cashexp / 12.0)
-df["honest_bond"] = (df.unrstrctnetasstsend - df.lndbldgsequipend
-                     + df.secrdmrtgsend + df.txexmptbndsend) / (df.cashexp / 12.0)
-df["cashmonths"] = (df.nonintcashend + df.svngstempinvend) / (df.cashexp / 12.0)
-
-c3 = df[df.subseccd == 3].copy()
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import intermediate, populations, reserve, sweep
+from soilib.ecdf import ECDF
+from soilib.groups import Groups
+
+EXPLORE = "--explore" in sys.argv[1:]     # unchecked extras; see the docstring
+
+# Deduped extract + every reserve variant, computed once in soilib/reserve.py
+# (shared with months-of-cash-at-scale and who-pays so the copies can't drift).
+# "c3_reserve" is the analysed 501(c)(3) population (soilib/populations.py);
+# "neg" refines it, and each is gathered once, not filtered and copied.
+df = reserve.load("../data/24eoextract990.csv")
+pop = populations.Populations(df)
+pop.define("neg", lambda d: d.honest <= 0, within="c3_reserve")
+
+c3 = pop.select("c3_reserve")
 N = len(c3)
-neg = c3[c3.honest <= 0].copy()
+neg = pop.select("neg")
 n = len(neg)
 
 print(f"501(c)(3) analyzed: {N:,}")
 print(f"below zero (honest <= 0): {n:,} = {n/N*100:.1f}%  (1 in {N/n:.1f})")
-print(f"depth: median {neg.honest.median():.1f}  p25 {neg.honest.quantile(.25):.1f}"
-      f"  p10 {neg.honest.quantile(.10):.1f}")
-print(f"only mildly under (>= -1 mo, incl 0): {(neg.honest >= -1).mean()*100:.1f}%")
-print(f"deep (< -12 mo): {(neg.honest < -12).mean()*100:.1f}%")
+depth = ECDF(neg.honest)
+med, p25, p10 = depth.quantile([.5, .25, .10])
+print(f"depth: median {med:.1f}  p25 {p25:.1f}  p10 {p10:.1f}")
+print(f"only mildly under (>= -1 mo, incl 0): {depth.share('>=', -1)*100:.1f}%")
+print(f"deep (< -12 mo): {depth.share('<', -12)*100:.1f}%")
 
 # Three mutually exclusive causes.
 underwater = neg.totnetassetend < 0                                  # A
@@ -60,17 +65,19 @@ print(f"  B unrestricted deficit, total NA >= 0:    {unrest_def.mean()*100:5.1f}
 print(f"  C asset-rich, reserve-poor (line27>=0):   {asset_rich.mean()*100:5.1f}%  ({asset_rich.sum():,})")
 
 print("\nliquidity:")
-print(f"  positive cash on hand:      {(neg.cashmonths > 0).mean()*100:.1f}%")
-print(f"  median cash-on-hand months: {neg.cashmonths.median():.1f}")
-print(f"  >= 3 months literal cash:   {(neg.cashmonths >= 3).mean()*100:.1f}%")
+cash = ECDF(neg.cashmonths)
+print(f"  positive cash on hand:      {cash.share('>', 0)*100:.1f}%")
+print(f"  median cash-on-hand months: {cash.median():.1f}")
+print(f"  >= 3 months literal cash:   {cash.share('>=', 3)*100:.1f}%")
 
 print("\nbelow-zero share by expense band:")
 bands = [(0, 5e5, "<$500K"), (5e5, 5e6, "$500K-5M"),
          (5e6, 5e7, "$5M-50M"), (5e7, np.inf, ">$50M")]
-for lo, hi, name in bands:
-    s = c3[(c3.totfuncexpns >= lo) & (c3.totfuncexpns < hi)]
-    print(f"  {name:>10} (n={len(s):>7,}): below-zero {(s.honest<=0).mean()*100:5.1f}%"
-          f"   underwater {(s.totnetassetend<0).mean()*100:4.1f}%")
+by_band = Groups.bands(c3.totfuncexpns, [lo for lo, _, _ in bands] + [np.inf])
+bz, uw = by_band.share(c3.honest <= 0), by_band.share(c3.totnetassetend < 0)
+for i, (_, _, name) in enumerate(bands):
+    print(f"  {name:>10} (n={by_band.sizes[i]:>7,}): below-zero {bz[i]*100:5.1f}%"
+          f"   underwater {uw[i]*100:4.1f}%")
 
 distress = neg[(neg.cashmonths < 1) & (neg.totnetassetend < 0)]
 print(f"\ndistress cluster (total NA < 0 AND < 1 mo cash): "
@@ -78,9 +85,33 @@ print(f"\ndistress cluster (total NA < 0 AND < 1 mo cash): "
 print(f"footprint: below-zero orgs run ${neg.totfuncexpns.sum()/1e9:.0f}B "
       f"= {neg.totfuncexpns.sum()/c3.totfuncexpns.sum()*100:.0f}% of sector expenses")
 
-neg[["honest", "honest_bond", "cashmonths", "totfuncexpns",
-     "unrstrctnetasstsend", "totnetassetend", "lndbldgsequipend",
-     "txexmptbndsend"]].to_csv("neg_c3.csv.gz", index=False, compression="gzip")
-c3[["honest", "cashmonths", "totfuncexpns", "totnetassetend"]].to_csv(
-    "all_c3.csv.gz", index=False, compression="gzip")
-print("\nwrote neg_c3.csv.gz, all_c3.csv.gz")
+intermediate.save("neg_c3", neg[["honest", "honest_bond", "cashmonths", "totfuncexpns",
+                                 "unrstrctnetasstsend", "totnetassetend",
+                                 "lndbldgsequipend", "txexmptbndsend"]])
+intermediate.save("all_c3", c3[["honest", "cashmonths", "totfuncexpns", "totnetassetend"]])
+print("\nwrote neg_c3 and all_c3 (.csv.gz + .npy)")
+
+# How much do the figures above lean on the definitions' choices? Every
+# statistic, over a grid of FASB tolerance x cash-expense guard x bond add-back
+# x band edges x depth cut-offs, in one pass (soilib/sweep.py); the row at
+# tol 1000, guard 0, no bonds is the one printed above. With --explore only:
+# not in the spec, so printed and written to sensitivity.csv, not checked.
+if EXPLORE:
+    grid = sweep.sweep(df)
+    grid.to_csv("sensitivity.csv", index=False)
+    top = grid[grid.band.isna() & grid.cut.isna()]
+    settings = top[["fasb_tol", "cashexp_min", "bond"]].drop_duplicates()
+    print(f"\nsensitivity (--explore; not checked) over {len(settings)} settings of"
+          " FASB tolerance x cash-expense guard x bond add-back (the setting above,"
+          " then the range):")
+    for stat, label in (("below_zero", "below zero"), ("A", "A underwater"),
+                        ("B", "B unrestricted deficit"), ("C", "C asset-rich")):
+        v = top[top.stat == stat].set_index(["fasb_tol", "cashexp_min", "bond"]).value
+        print(f"  {label:<24} {v[1000, 0, False]*100:5.1f}%   range "
+              f"{v.min()*100:5.1f}% - {v.max()*100:5.1f}%")
+    med = grid[(grid.stat == "median") & (grid.edges == "posts")]
+    print("  median honest months by band:")
+    for band, v in med.groupby("band", sort=False):
+        v = v.set_index(["fasb_tol", "cashexp_min", "bond"]).value
+        print(f"    {band:>16} {v[1000, 0, False]:6.2f}   range {v.min():6.2f} - {v.max():6.2f}")
+    print("wrote sensitivity.csv")
@@ -2,16 +2,23 @@
 """Data figures for the below-zero post. numpy + matplotlib, brand palette
 (notes/blog-authoring.md §5). Lettered callouts only; captions carry the words.
 
-Reads neg_c3.csv.gz and all_c3.csv.gz (written by compute.py). Writes:
+Reads neg_c3 and all_c3 (written by compute.py; .npy memory-mapped, or the
+.csv.gz) via ../soilib/intermediate.py. Writes:
   images/2026-07-11-below-zero-hero.png          Figure 1  (1200x630 hero/OG)
   images/2026-07-11-below-zero-by-size.png       Figure 2
   images/2026-07-11-below-zero-liquidity.png     Figure 3
 """
 
+import pathlib
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import intermediate
+
 INK = "#143f33"
 TEAL = "#2f7da3"
 TEAL_LIFT = "#5b9fc0"
@@ -27,8 +34,8 @@ mpl.rcParams.update({
     "axes.spines.right": False, "savefig.dpi": 150,
 })
 
-neg = np.genfromtxt("neg_c3.csv.gz", delimiter=",", names=True)
-allc3 = np.genfromtxt("all_c3.csv.gz", delimiter=",", names=True)
+neg = intermediate.load("neg_c3")
+allc3 = intermediate.load("all_c3")
 
 honest = neg["honest"]
 totNA = neg["totnetassetend"]
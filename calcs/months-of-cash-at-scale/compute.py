@@ -22,56 +22,60 @@ Field map (24eofinextractdoc.xlsx):
   subseccd             501(c) subsection code
 """
 
-import pandas as pd
+import pathlib
+import sys
+
 import numpy as np
 
-COLS = ["EIN", "tax_pd", "subseccd", "totfuncexpns", "deprcatndepletn",
-        "unrstrctnetasstsend", "temprstrctnetasstsend", "permrstrctnetasstsend",
-        "lndbldgsequipend", "secrdmrtgsend", "txexmptbndsend",
-        "totnetassetend", "nonintcashend", "svngstempinvend"]
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import extract, intermediate, populations, reserve
+from soilib.ecdf import ECDF
+from soilib.groups import Groups
 
-df = pd.read_csv("../data/24eoextract990.csv", usecols=COLS)
-n_raw = len(df)
+SRC = "../data/24eoextract990.csv"
 
-# Dedupe: keep the latest tax period per EIN (amended/multiple filings).
-df = df.sort_values("tax_pd").drop_duplicates("EIN", keep="last")
-n_dedup = len(df)
+# One row per EIN (latest tax period; amended/multiple filings dropped) with
+# every reserve variant already computed — see ../soilib/reserve.py, which
+# below-zero and who-pays share, for the FASB check and the formulas.
+pop = populations.Populations(reserve.load(SRC))
+n_raw = extract.n_rows(SRC)
+n_dedup = len(pop.frame)
 
 # FASB check: orgs that don't follow ASC 958 report net assets on Part X
 # lines 30-32 and leave 27-29 blank, which would fake a zero/negative
 # unrestricted figure. Keep only filers whose 27+28+29 reconciles to
 # line 33 (within $1K tolerance or exactly when 33 is 0).
-fasb = (df.unrstrctnetasstsend + df.temprstrctnetasstsend
-        + df.permrstrctnetasstsend - df.totnetassetend).abs() <= 1000
-n_fasb_dropped = (~fasb).sum()
+n_fasb_dropped = len(~pop["fasb"])
 
-# Cash expenses must be positive to define a runway.
-df["cashexp"] = df.totfuncexpns - df.deprcatndepletn
-df = df[fasb & (df.cashexp > 0)].copy()
+# Cash expenses must be positive to define a runway. "reserve" is both tests
+# (soilib/populations.py), "c3_reserve" its 501(c)(3) rows; each is gathered
+# with only the columns used below.
+df = pop.select("reserve", ["honest", "naive"])
 n_pos = len(df)
 
-df["honest"] = (df.unrstrctnetasstsend - df.lndbldgsequipend
-                + df.secrdmrtgsend) / (df.cashexp / 12.0)
-df["naive"] = df.totnetassetend / (df.totfuncexpns / 12.0)
+# honest_bond is the sensitivity that also adds back tax-exempt bonds (Pt X
+# line 20) — how large orgs finance buildings; the NORI recipe only adds back
+# line 23. cashmonths is the NFF-comparable metric: months of literal cash on
+# hand (Pt X lines 1+2).
 
-# Sensitivity: also add back tax-exempt bonds (Pt X line 20) — how large
-# orgs finance buildings; the NORI recipe only adds back line 23.
-df["honest_bond"] = (df.unrstrctnetasstsend - df.lndbldgsequipend
-                     + df.secrdmrtgsend + df.txexmptbndsend) / (df.cashexp / 12.0)
+c3 = pop.select("c3_reserve", ["honest", "naive", "honest_bond", "cashmonths",
+                                "totfuncexpns"])
 
-# NFF-comparable metric: months of literal cash on hand (Pt X lines 1+2).
-df["cashmonths"] = (df.nonintcashend + df.svngstempinvend) / (df.cashexp / 12.0)
+THRESHOLDS = [0, 1, 3, 6, 12, 24]
 
-c3 = df[df.subseccd == 3]
 
 def describe(s, label):
-    pct = lambda p: np.percentile(s, p)
+    e = ECDF(s)                 # one sort; every line below is a lookup
+    p10, p25, p50, p75, p90 = e.percentile([10, 25, 50, 75, 90])
     print(f"\n== {label} (n={len(s):,}) ==")
-    print(f"  p10 {pct(10):8.1f}  p25 {pct(25):8.1f}  median {pct(50):8.1f}"
-          f"  p75 {pct(75):8.1f}  p90 {pct(90):8.1f}")
-    for thr in [0, 1, 3, 6, 12, 24]:
-        print(f"  share <= {thr:>2} months: {(s <= thr).mean()*100:5.1f}%")
-    print(f"  share > 24 months: {(s > 24).mean()*100:5.1f}%")
+    if len(e.x) < e.n:          # blanks: in the shares' denominator, not the percentiles
+        print(f"  percentiles over the {len(e.x):,} with a value"
+              f" ({e.n - len(e.x):,} blank); shares over all {e.n:,}")
+    print(f"  p10 {p10:8.1f}  p25 {p25:8.1f}  median {p50:8.1f}"
+          f"  p75 {p75:8.1f}  p90 {p90:8.1f}")
+    for thr, share in zip(THRESHOLDS, e.share("<=", THRESHOLDS)):
+        print(f"  share <= {thr:>2} months: {share*100:5.1f}%")
+    print(f"  share > 24 months: {e.share('>', 24)*100:5.1f}%")
 
 print(f"rows in extract: {n_raw:,}; after EIN dedupe: {n_dedup:,}; "
       f"non-FASB dropped: {n_fasb_dropped:,}; analyzed: {n_pos:,}"
@@ -88,17 +92,17 @@ describe(c3.cashmonths, "501(c)(3) ONLY - months of cash on hand (NFF-comparable
 bands = [(0, 5e5, "<$500K"), (5e5, 5e6, "$500K-$5M"),
          (5e6, 5e7, "$5M-$50M"), (5e7, np.inf, ">$50M")]
 print("\n== 501(c)(3) honest months, by total-expense band ==")
-for lo, hi, name in bands:
-    s = c3[(c3.totfuncexpns >= lo) & (c3.totfuncexpns < hi)].honest
-    print(f"  {name:>10} (n={len(s):>7,}): median {np.percentile(s,50):6.1f}"
-          f"  <=3mo {(s<=3).mean()*100:5.1f}%  <=1mo {(s<=1).mean()*100:5.1f}%"
-          f"  >12mo {(s>12).mean()*100:5.1f}%")
+by_band = Groups.bands(c3.totfuncexpns, [lo for lo, _, _ in bands] + [np.inf])
+for (_, _, name), e in zip(bands, by_band.ecdfs(c3.honest)):
+    le3, le1 = e.share("<=", [3, 1])
+    print(f"  {name:>10} (n={len(e):>7,}): median {e.percentile(50):6.1f}"
+          f"  <=3mo {le3*100:5.1f}%  <=1mo {le1*100:5.1f}%"
+          f"  >12mo {e.share('>', 12)*100:5.1f}%")
 
 # How much does honesty cost? (median naive - honest gap)
 gap = (c3.naive - c3.honest)
 print(f"\nmedian correction (naive - honest), 501(c)(3): {gap.median():.1f} months")
 
 # Save the per-band and overall histogram data for the figure.
-out = c3[["honest", "naive", "honest_bond", "cashmonths", "totfuncexpns"]].copy()
-out.to_csv("c3_months.csv.gz", index=False, compression="gzip")
-print("\nwrote c3_months.csv.gz")
+intermediate.save("c3_months", c3)
+print("\nwrote c3_months.csv.gz, c3_months.npy")
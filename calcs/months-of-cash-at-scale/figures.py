@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Data figures for the months-of-cash-at-scale post.
 
-Reads c3_months.csv.gz (written by compute.py) and produces:
+Reads c3_months (written by compute.py; c3_months.npy memory-mapped, or
+c3_months.csv.gz) via ../soilib/intermediate.py and produces:
   images/2026-07-07-months-of-cash-at-scale-distribution.png  (Figure 2)
   images/2026-07-07-months-of-cash-at-scale-bands.png         (Figure 3)
 
@@ -9,10 +10,16 @@ numpy + matplotlib only (no pandas — the csv is 5 numeric columns).
 Brand palette per notes/blog-authoring.md §5.
 """
 
+import pathlib
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import intermediate
+
 INK = "#143f33"
 TEAL = "#2f7da3"
 TEAL_LIFT = "#5b9fc0"
@@ -28,7 +35,7 @@ mpl.rcParams.update({
     "axes.spines.right": False, "savefig.dpi": 150,
 })
 
-df = np.genfromtxt("c3_months.csv.gz", delimiter=",", names=True)
+df = intermediate.load("c3_months")
 honest = df["honest"]
 totfuncexpns = df["totfuncexpns"]
 
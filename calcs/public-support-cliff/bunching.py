@@ -0,0 +1,187 @@
+"""Batched evaluation of the bunching estimator in compute.py.
+
+compute.py's parts() is the estimator as a reader should see it: histogram one
+sample, fit one polynomial, sum the window. The placebo, grid, ten-percent and
+bootstrap sections run that estimator dozens to tens of thousands of times,
+and each call re-histogrammed ~112k values and refitted from scratch. This
+module evaluates the SAME estimator from one histogram. numpy only; compute.py
+imports it from the same directory.
+
+ONE FINE HISTOGRAM
+  Bunching(data) bins the data once on a 0.25-point grid over [0, 100]. Every
+  bin edge any spec uses (integer lo/hi, bw of 0.25, 0.5 or 1) is on that grid
+  and exactly representable, so a spec's histogram is a difference of
+  cumulative fine counts — the same integers np.histogram returns, including
+  its closed right-most edge.
+
+ONE SOLVE PER WINDOW, NOT PER SPEC
+  The counterfactual is linear in the counts. For a spec, the fitted-then-
+  summed masses are
+
+      cf_above = a . y        cf_below = b . y
+
+  for weight vectors a, b that depend only on the bin midpoints, the degree,
+  the threshold and W — never on the data. Specs sharing (lo, hi, bw, degree)
+  share a design matrix, so their weights come from one batched QR (excluded
+  bins enter as zero rows). E, M and both masses are then dot products, and a
+  stack of histograms (the bootstrap) is one matrix product. The polynomial is
+  fitted in x rescaled to [-1, 1]: the same least-squares fit as np.polyfit on
+  the raw midpoints, better conditioned, equal to it to ~1e-9.
+
+MASS-PRESERVING MODE  (mode="mass")
+  The integration constraint (Chetty et al.): the counterfactual's total over
+  [lo, hi] must equal the observed total, so bunching only MOVES mass. That is
+  least squares under one linear equality, v.c = sum(y) with v = V^T 1, and
+  its closed form is the free fit c0 plus a step along G v:
+
+      c = c0 + G v (sum(y) - v.c0) / (v.G v),      G = (A^T A)^-1 = R^-1 R^-T
+
+  Still linear in y, so a window's weights are the free ones plus a multiple
+  of (1 - the free weights for the whole range): no iteration, same cost.
+
+THRESHOLD SCAN
+  scan() evaluates the statistic at every threshold on a fine grid (0.05-point
+  steps). Each window [t - 13, t + 17] is snapped to the bin grid, so as t
+  moves the window slides one bin at a time and about bw / step thresholds
+  share each window position: one batched solve per position, not per
+  threshold, and every value is still exactly parts() at that geometry.
+  envelope() turns the scan into a local placebo band.
+
+BOOTSTRAP BY HISTOGRAM REWEIGHTING
+  Drawing n organisations with replacement and re-histogramming is the same,
+  in distribution, as drawing the bin counts directly:
+
+      counts ~ Multinomial(n, [c_1/n, ..., c_B/n, outside/n])
+
+  where c_b are the observed counts and "outside" is every organisation not in
+  [lo, hi]. Not an approximation — the resampled histogram IS this multinomial.
+"""
+
+from itertools import repeat
+
+import numpy as np
+
+FINE = 0.25
+
+
+def envelope(t, s, skip=(), near=10.0, gap=3.0, q=(2.5, 97.5)):
+    """Local placebo band for a scan: at each t, the q percentiles of s over
+    thresholds within `near` points of t but at least `gap` from it and from
+    every threshold in `skip` (the real rules). (len(t), len(q)); NaN where no
+    placebo qualifies."""
+    t, s = np.asarray(t, dtype=float), np.asarray(s, dtype=float)
+    ok = np.ones(len(t), dtype=bool)
+    for r in skip:
+        ok &= np.abs(t - r) >= gap
+    out = np.full((len(t), len(q)), np.nan)
+    for i, ti in enumerate(t):
+        d = np.abs(t - ti)
+        sel = ok & (d <= near) & (d >= gap)
+        if sel.any():
+            out[i] = np.percentile(s[sel], q)
+    return out
+
+
+class Bunching:
+    """The support-ratio data, binned once; parts() for any number of specs.
+
+    A spec is (cliff, lo, hi, bw, deg, w), the arguments of compute.py's
+    parts(). Results are rows of (E, M, cf_below, cf_above).
+    """
+
+    def __init__(self, data, fine=FINE, lo=0.0, hi=100.0):
+        data = np.asarray(data, dtype=float)
+        self.n = len(data)
+        self.fine, self.lo = fine, lo
+        self.edges = lo + fine * np.arange(int(round((hi - lo) / fine)) + 1)
+        idx = np.searchsorted(self.edges, data, side="right") - 1
+        ok = (idx >= 0) & (idx < len(self.edges))
+        # per fine edge: values in [edge, next edge), and values exactly ON it
+        self.cum = np.concatenate([[0], np.cumsum(np.bincount(idx[ok], minlength=len(self.edges)))])
+        self.on = np.bincount(idx[ok][data[ok] == self.edges[idx[ok]]], minlength=len(self.edges))
+        self._w = {}
+
+    def counts(self, lo, hi, bw):
+        """np.histogram(data, np.arange(lo, hi + bw, bw)) by summation."""
+        e = np.arange(lo, hi + bw, bw)
+        k = np.rint((e - self.lo) / self.fine).astype(np.intp)
+        if not (np.all((k >= 0) & (k < len(self.edges))) and np.array_equal(self.edges[k], e)):
+            raise ValueError(f"bins arange({lo}, {hi}+{bw}, {bw}) are off the {self.fine} grid")
+        cnt = self.cum[k[1:]] - self.cum[k[:-1]]
+        cnt[-1] += self.on[k[-1]]                # np.histogram closes the last bin
+        return cnt, (e[:-1] + e[1:]) / 2
+
+    def weights(self, lo, hi, bw, deg, cliffs, ws, mode="free"):
+        """(ab, be, a, b) for each (cliff, w) pair on one window, each (S, n_bins):
+        ab/be select the above/below window bins, a/b give cf_above/cf_below
+        as a dot product with the counts. Cached per (lo, hi, bw, deg, cliff, w)."""
+        if mode not in ("free", "mass"):
+            raise ValueError(f"mode must be 'free' or 'mass', not {mode!r}")
+        key = (lo, hi, bw, deg, mode)
+        todo = [(c, w) for c, w in zip(cliffs, ws) if key + (c, w) not in self._w]
+        if todo:
+            mid = self.counts(lo, hi, bw)[1]
+            c, w = (np.array(v, dtype=float)[:, None] for v in zip(*todo))
+            V = np.vander((mid - (lo + hi) / 2) / ((hi - lo) / 2), deg + 1)
+            fit = ~((mid > c - w) & (mid < c + w))
+            ab = ((mid >= c) & (mid < c + w)).astype(float)
+            be = ((mid >= c - w) & (mid < c)).astype(float)
+            Q, R = np.linalg.qr(fit[:, :, None] * V)
+            Rt = np.swapaxes(R, 1, 2)
+            # window sum of the fit: s @ V @ R^-1 @ Q^T @ y, so weights are Q @ R^-T @ V^T s
+            ta = np.linalg.solve(Rt, (ab @ V)[..., None])[..., 0]
+            tb = np.linalg.solve(Rt, (be @ V)[..., None])[..., 0]
+            a = np.einsum("snk,sk->sn", Q, ta)
+            b = np.einsum("snk,sk->sn", Q, tb)
+            if mode == "mass":
+                tv = np.linalg.solve(Rt, np.broadcast_to(V.sum(0), ta.shape)[..., None])[..., 0]
+                slack = 1 - np.einsum("snk,sk->sn", Q, tv)   # sum(y) - v.c0, as weights
+                vv = (tv * tv).sum(1, keepdims=True)
+                a = a + (ta * tv).sum(1, keepdims=True) / vv * slack
+                b = b + (tb * tv).sum(1, keepdims=True) / vv * slack
+            for i, cw in enumerate(todo):
+                self._w[key + cw] = (ab[i], be[i], a[i], b[i])
+        return tuple(np.array(x) for x in zip(*(self._w[key + cw] for cw in zip(cliffs, ws))))
+
+    def evaluate(self, specs, mode="free"):
+        """(E, M, cf_below, cf_above) for every spec, as an (S, 4) array.
+        Specs are grouped by window so each group is one batched solve."""
+        specs = [tuple(float(v) if i != 4 else int(v) for i, v in enumerate(s)) for s in specs]
+        out = np.empty((len(specs), 4))
+        groups = {}
+        for i, (c, lo, hi, bw, deg, w) in enumerate(specs):
+            groups.setdefault((lo, hi, bw, deg), []).append((i, c, w))
+        for (lo, hi, bw, deg), members in groups.items():
+            rows, cs, ws = map(list, zip(*members))
+            y = self.counts(lo, hi, bw)[0].astype(float)
+            ab, be, a, b = self.weights(lo, hi, bw, deg, cs, ws, mode)
+            out[rows] = np.column_stack([(ab - a) @ y, (b - be) @ y, b @ y, a @ y])
+        return out
+
+    def scan(self, thresholds, bw, deg, w, below=13.0, above=17.0, lo=1.0, hi=99.0,
+             mode="free"):
+        """evaluate() at each threshold t, window [t - below, t + above] snapped
+        to the bw grid and clipped to [lo, hi]."""
+        t = np.asarray(thresholds, dtype=float)
+        wlo = np.maximum(lo, np.round((t - below) / bw) * bw)
+        whi = np.minimum(hi, np.round((t + above) / bw) * bw)
+        return self.evaluate(zip(t, wlo, whi, repeat(bw), repeat(deg), repeat(w)), mode)
+
+    def multinomial_counts(self, lo, hi, bw, n_boot, rng):
+        """(n_boot, n_bins) bootstrap histograms — see module docstring."""
+        cnt = self.counts(lo, hi, bw)[0]
+        pvals = np.append(cnt, self.n - cnt.sum()) / self.n
+        return rng.multinomial(self.n, pvals, size=n_boot)[:, :-1]
+
+    def bootstrap(self, spec, n_boot, rng, mode="free"):
+        """(n_boot, 4) rows of (E, M, cf_below, cf_above) over bootstrap draws."""
+        c, lo, hi, bw, deg, w = spec
+        Y = self.multinomial_counts(lo, hi, bw, n_boot, rng).astype(float)
+        ab, be, a, b = (x[0] for x in self.weights(lo, hi, bw, int(deg), [c], [w], mode))
+        return np.column_stack([Y @ (ab - a), Y @ (b - be), Y @ b, Y @ a])
+
+
+def boot_task(rng, arrays, spec, n_boot, mode="free"):
+    """One batch of the bootstrap, for soilib.parallel.run_tasks: bin
+    arrays["p"] and return Bunching.bootstrap's (n_boot, 4)."""
+    return Bunching(arrays["p"]).bootstrap(spec, n_boot, rng, mode)
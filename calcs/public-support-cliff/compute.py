@@ -38,12 +38,18 @@ WHAT IT DOES
     decisive (z of E = 1.50, z of M = 2.45). What is significant is the JOINT
     asymmetry around the line, not either margin.
 
-  NOT IMPLEMENTED: the integration constraint used in the bunching literature
-    (Chetty et al.), which forces the counterfactual to preserve total mass.
-    Without it E and M need not balance, and here they do not (29 vs 51). A
-    mass-preserving counterfactual would be the more faithful estimator; this
-    script does not have one, and the reported figures should be read with that
-    in mind.
+  THE INTEGRATION CONSTRAINT  (mode="mass")
+    The headline counterfactual is a free polynomial fit, so E and M need not
+    balance, and here they do not (29 vs 51). The bunching literature (Chetty
+    et al.) constrains the counterfactual to preserve total mass: its area over
+    the fitting region must equal the observed area, so bunching only moves
+    organisations. parts(..., mode="mass") is that estimator — least squares
+    under one equality constraint, solved in closed form. Section INTEGRATION
+    CONSTRAINT runs it through the same placebo, grid and bootstrap as the free
+    fit, with --explore only. Its figures go to explore.json, not stats.json,
+    and are not checked: the spec and the post are pinned to the free fit, and
+    moving the headline to the constrained fit means re-deriving both from the
+    full extract.
 
   The specification (bw=0.5, degree=5, W=1.5) was FIXED BEFORE the placebo test.
   Section GRID reports all 12 bandwidth/degree combinations, including the ones
@@ -63,18 +69,38 @@ DATA
   The support ratio is a FIVE-YEAR measure (Schedule A Part II), not annual.
 
 RUN
-  python3 compute.py          # needs pandas + numpy
+  python3 compute.py          # needs pandas + numpy (+ pyarrow for the extract cache)
+  Download bunching.py with it: the placebo, bootstrap and grid sections use it.
+  python3 compute.py --explore  also runs what the spec does not check: the
+  threshold scan (every 0.05 points) and the integration constraint, written
+  to scan and explore.json.
 """
 
 import json
+import pathlib
+import sys
+
 import numpy as np
 import pandas as pd
 
+import bunching
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import intermediate, populations, session
+from soilib.parallel import run_tasks
+
 SRC = "../data/24eoextract990.csv"
 CLIFF = 100.0 / 3.0
 BW, DEG, W = 0.5, 5, 1.5           # frozen before the placebo test
 LO, HI = 20.0, 50.0                # fitting region for the real cliff
-BOOT_SEED, BOOT_N = 7, 400         # pinned so a reader reproduces the CI
+BOOT_SEED, BOOT_N = 7, 20_000      # pinned so a reader reproduces the CI
+BOOT_MODE = "multinomial"          # or "resample" (the original loop; use 400)
+BOOT_BATCHES = 20                  # fixed task count, so the draws never depend on WORKERS
+assert BOOT_N % BOOT_BATCHES == 0, "BOOT_N must split evenly into BOOT_BATCHES"
+WORKERS = None                     # bootstrap processes; None = every core
+SCAN_STEP, SCAN_LO, SCAN_HI = 0.05, 5.0, 95.0   # threshold scan grid (--explore)
+
+EXPLORE = "--explore" in sys.argv[1:]     # unchecked extras; see the docstring
 
 FAILURES = []
 
@@ -86,37 +112,48 @@ def check(label, got, want, tol):
         FAILURES.append(f"{label}: got {got:,.4f}, spec says {want:,.4f}")
 
 
-def parts(data, cliff, lo, hi, bw=BW, deg=DEG, w=W):
+def parts(data, cliff, lo, hi, bw=BW, deg=DEG, w=W, mode="free"):
     """Return (E, M, cf_below, cf_above) against a polynomial counterfactual
     fitted on the region OUTSIDE the +/-w window.
       E = excess mass above the threshold
       M = missing mass below it
-    Reported separately because E+M double-counts movers (see module docstring)."""
+    Reported separately because E+M double-counts movers (see module docstring).
+    mode="mass" constrains the counterfactual to the observed total over
+    [lo, hi] (the integration constraint)."""
     bins = np.arange(lo, hi + bw, bw)
     cnt, e = np.histogram(data, bins=bins)
     mid = (e[:-1] + e[1:]) / 2
     excl = (mid > cliff - w) & (mid < cliff + w)
-    cf = np.polyval(np.polyfit(mid[~excl], cnt[~excl], deg), mid)
+    if mode == "free":
+        cf = np.polyval(np.polyfit(mid[~excl], cnt[~excl], deg), mid)
+    else:
+        # min |A c - y|^2  s.t.  sum(V c) = sum(y): the KKT system, in x
+        # rescaled to [-1, 1] so a degree-5 Vandermonde stays well conditioned
+        V = np.vander((mid - (lo + hi) / 2) / ((hi - lo) / 2), deg + 1)
+        A, v = V[~excl], V.sum(0)
+        K = np.block([[A.T @ A, v[:, None]], [v[None], np.zeros((1, 1))]])
+        cf = V @ np.linalg.solve(K, np.append(A.T @ cnt[~excl], cnt.sum()))[:-1]
     ab = (mid >= cliff) & (mid < cliff + w)
     be = (mid >= cliff - w) & (mid < cliff)
     return (cnt[ab].sum() - cf[ab].sum(), cf[be].sum() - cnt[be].sum(),
             cf[be].sum(), cf[ab].sum())
 
 
-def displacement(data, cliff, lo, hi, bw=BW, deg=DEG, w=W):
+def displacement(data, cliff, lo, hi, bw=BW, deg=DEG, w=W, mode="free"):
     """E + M. A TEST STATISTIC, not a count of organisations — see docstring."""
-    E, M, _, _ = parts(data, cliff, lo, hi, bw, deg, w)
+    E, M, _, _ = parts(data, cliff, lo, hi, bw, deg, w, mode)
     return E + M
 
 
 COLS = ["EIN", "tax_pd", "subseccd", "pubsupplesspct170", "totsupp170",
         "nonpfrea", "exceeds2pct170", "totrevenue", "totassetsend"]
-df = pd.read_csv(SRC, usecols=COLS)
-df = df.sort_values("tax_pd").drop_duplicates("EIN", keep="last")
-d = df[(df.subseccd == 3) & (df.totsupp170 > 0)].copy()
-d["npr"] = pd.to_numeric(d.nonpfrea, errors="coerce")
+df = session.latest(SRC, COLS)
+pop = populations.Populations(df)       # "c3" and the rest: soilib/populations.py
+pop.define("supp", lambda d: d.totsupp170 > 0, within="c3")
+pop.define("pct", lambda d: (d.nonpfrea == 7)
+           & (d.pubsupplesspct170 / d.totsupp170 * 100).between(0, 100), within="supp")
+d = pop.select("pct")
 d["pct"] = d.pubsupplesspct170 / d.totsupp170 * 100
-d = d[(d.npr == 7) & (d.pct.between(0, 100))].copy()
 d["pct_excluded"] = d.exceeds2pct170.fillna(0) / d.totsupp170 * 100
 p = d.pct.values
 
@@ -159,16 +196,24 @@ check("mass the counterfactual expects below", CF_BE, 331.4, 0.1)
 MISS_PCT = REAL_M / CF_BE * 100
 check("M as % of expected below  <-- effect size", MISS_PCT, 15.5, 0.1)
 
+# Everything below re-runs this estimator many times over. bunching.Bunching
+# bins p once and evaluates any list of specifications from that histogram
+# with one batched least-squares solve per window; it must agree with parts().
+ENGINE = bunching.Bunching(p)
+SPEC = (CLIFF, LO, HI, BW, DEG, W)
+check("batched engine vs parts(), max |diff|",
+      float(np.abs(ENGINE.evaluate([SPEC])[0] - (REAL_E, REAL_M, CF_BE, CF_AB)).max()),
+      0.0, 1e-6)
+
 # ---- placebo: identical estimator at thresholds with no rule -------------
 # Window geometry mirrors the real one: [cliff-13.33, cliff+16.67] -> [20,50].
 print("\nPLACEBO (21 fake thresholds)")
-placebos = []
-for t in np.arange(22, 49, 1.0):
-    if abs(t - CLIFF) < 3:
-        continue
-    s = displacement(p, float(t), max(10.0, t - 13.0), min(95.0, t + 17.0))
-    placebos.append([float(t), float(s)])
-pl = np.array([s for _, s in placebos])
+PLACEBO_T = [float(t) for t in np.arange(22, 49, 1.0) if abs(t - CLIFF) >= 3]
+PLACEBO = [(t, max(10.0, t - 13.0), min(95.0, t + 17.0), BW, DEG, W) for t in PLACEBO_T]
+PP = ENGINE.evaluate(PLACEBO)
+pE, pM = PP[:, 0], PP[:, 1]
+pl = pE + pM
+placebos = [[t, float(s)] for t, s in zip(PLACEBO_T, pl)]
 check("n placebos", len(pl), 21, 0)
 check("placebo mean", pl.mean(), -4.2, 0.3)
 check("placebo sd", pl.std(), 22.4, 0.3)
@@ -181,10 +226,6 @@ check("largest placebo", pl.max(), 35.0, 0.5)
 # placebo test rejects. The post must say so rather than imply that "80
 # organisations bunched" was directly observed.
 print("\nPLACEBO — each half on its own (the caveat, not the headline)")
-pp = [parts(p, float(t), max(10.0, t - 13.0), min(95.0, t + 17.0))
-      for t in np.arange(22, 49, 1.0) if abs(t - CLIFF) >= 3]
-pE = np.array([x[0] for x in pp])
-pM = np.array([x[1] for x in pp])
 Z_E = (REAL_E - pE.mean()) / pE.std()
 Z_M = (REAL_M - pM.mean()) / pM.std()
 check("z of E alone (NOT significant)", Z_E, 1.50, 0.03)
@@ -200,24 +241,49 @@ check("sd(E+M) observed", (pE + pM).std(), 22.4, 0.1)
 check("sd(E+M) if independent", float(np.sqrt(pE.var() + pM.var())), 30.0, 0.1)
 
 # ---- bootstrap ----------------------------------------------------------
-rng = np.random.default_rng(BOOT_SEED)
-b = np.array([displacement(rng.choice(p, len(p), replace=True), CLIFF, LO, HI)
-              for _ in range(BOOT_N)])
-BLO, BHI = np.percentile(b, 2.5), np.percentile(b, 97.5)
-print(f"\nBOOTSTRAP (seed={BOOT_SEED}, {BOOT_N} resamples)")
+# "multinomial" draws the resampled HISTOGRAMS directly — the estimator only
+# sees bin counts, so this is the same bootstrap, not an approximation (see
+# bunching.py) — and scores all of them with the headline spec's cached
+# weights, one matrix product. The draws run as BOOT_BATCHES tasks across
+# WORKERS processes, each batch seeded from SeedSequence(BOOT_SEED).spawn, so
+# the result is bit-identical on any number of cores. "resample" is the
+# original loop (rng.choice over p, one refit per draw), kept serial to
+# reproduce the 400-draw run behind the spec.
+if BOOT_MODE == "multinomial":
+    bE, bM, _, _ = np.concatenate(run_tasks(
+        bunching.boot_task, BOOT_BATCHES, BOOT_SEED, {"p": p},
+        args=(SPEC, BOOT_N // BOOT_BATCHES), workers=WORKERS)).T
+    b = bE + bM
+else:
+    rng = np.random.default_rng(BOOT_SEED)
+    b = np.array([displacement(rng.choice(p, len(p), replace=True), CLIFF, LO, HI)
+                  for _ in range(BOOT_N)])
+BLO, BHI = np.percentile(b, [2.5, 97.5])
+# Monte Carlo error of the bounds themselves: the same percentiles over the
+# disjoint batches of draws, scaled to the whole run.
+batches = np.percentile(b.reshape(BOOT_BATCHES, -1), [2.5, 97.5], axis=1)
+MCSE_LO, MCSE_HI = batches.std(axis=1, ddof=1) / np.sqrt(BOOT_BATCHES)
+print(f"\nBOOTSTRAP (seed={BOOT_SEED}, {BOOT_N:,} draws, {BOOT_MODE})")
+# The +/-8 and +/-12 below are the Monte Carlo error of the SPEC's figures,
+# which came from 400 draws; this run's own error is the MCSE line. They stay
+# until the spec is re-pinned from a BOOT_N-draw run on the 2024 extract —
+# then they drop to ~1, the size of that run's MCSE.
 check("bootstrap 2.5th pct", BLO, 28.1, 8.0)
 check("bootstrap 97.5th pct", BHI, 129.0, 12.0)
+if BOOT_MODE == "multinomial":
+    check("Monte Carlo s.e. of the 2.5th pct", MCSE_LO, 0.0, 1.0)
+    check("Monte Carlo s.e. of the 97.5th pct", MCSE_HI, 0.0, 1.0)
 check("bootstraps <= 0", (b <= 0).sum(), 0, 0)
 assert BLO > 0, "bootstrap CI must exclude zero"
 
 # ---- specification grid: publish the whole pile -------------------------
 print("\nGRID (all 12 specifications)")
+GRID = [(bw, deg) for bw in (0.25, 0.5, 1.0) for deg in (3, 4, 5, 6)]
+GE = ENGINE.evaluate([(CLIFF, LO, HI, bw, deg, W) for bw, deg in GRID])
 grid = []
-for bw in (0.25, 0.5, 1.0):
-    for deg in (3, 4, 5, 6):
-        s = displacement(p, CLIFF, LO, HI, bw=bw, deg=deg)
-        grid.append([bw, deg, float(s)])
-        print(f"    bw={bw:<5} deg={deg}  displacement {s:+7.1f}")
+for (bw, deg), s in zip(GRID, GE[:, 0] + GE[:, 1]):
+    grid.append([bw, deg, float(s)])
+    print(f"    bw={bw:<5} deg={deg}  displacement {s:+7.1f}")
 g = np.array([s for _, _, s in grid])
 check("grid min", g.min(), 46.9, 0.5)
 check("grid max", g.max(), 95.4, 0.5)
@@ -225,9 +291,10 @@ check("grid cells positive", (g > 0).sum(), 12, 0)
 
 # ---- the 10% facts-and-circumstances floor: a NULL ----------------------
 print("\nTEN PERCENT FLOOR (reported as a null)")
-TEN = displacement(p, 10.0, 2.0, 25.0)
-tp = np.array([displacement(p, float(t), max(1.0, t - 7.0), t + 11.0)
-               for t in (5, 6, 7, 8, 13, 14, 15, 16, 17, 18)])
+TE = ENGINE.evaluate([(10.0, 2.0, 25.0, BW, DEG, W)]
+                     + [(float(t), max(1.0, t - 7.0), t + 11.0, BW, DEG, W)
+                        for t in (5, 6, 7, 8, 13, 14, 15, 16, 17, 18)])
+TEN, tp = TE[0, 0] + TE[0, 1], TE[1:, 0] + TE[1:, 1]
 TENZ = (TEN - tp.mean()) / tp.std()
 check("10% displacement", TEN, 44.6, 0.3)
 check("10% z (NOT significant)", TENZ, 1.73, 0.05)
@@ -270,9 +337,8 @@ cnt, e = np.histogram(p, bins=bins)
 mid = (e[:-1] + e[1:]) / 2
 excl = (mid > CLIFF - W) & (mid < CLIFF + W)
 cf = np.polyval(np.polyfit(mid[~excl], cnt[~excl], DEG), mid)
-pd.DataFrame({"mid": mid, "obs": cnt, "cf": cf}).to_csv(
-    "cf.csv.gz", index=False, compression="gzip")
-d[["pct", "pct_excluded"]].to_csv("cliff.csv.gz", index=False, compression="gzip")
+intermediate.save("cf", pd.DataFrame({"mid": mid, "obs": cnt, "cf": cf}))
+intermediate.save("cliff", d[["pct", "pct_excluded"]])
 
 with open("stats.json", "w") as f:
     json.dump({"n": int(len(d)), "median_pct": float(np.median(p)),
@@ -283,7 +349,9 @@ with open("stats.json", "w") as f:
                "real_displacement": float(REAL), "placebos": placebos,
                "placebo_mean": float(pl.mean()), "placebo_sd": float(pl.std()),
                "z": float(Z), "n_placebos_ge_real": int((pl >= REAL).sum()),
-               "boot_lo": float(BLO), "boot_hi": float(BHI), "grid": grid,
+               "boot_lo": float(BLO), "boot_hi": float(BHI),
+               "boot_n": BOOT_N, "boot_mode": BOOT_MODE,
+               "boot_mcse": [float(MCSE_LO), float(MCSE_HI)], "grid": grid,
                "ten_displacement": float(TEN), "ten_z": float(TENZ),
                "near_excluded_median": float(near.pct_excluded.median()),
                "typ_excluded_median": float(typ.pct_excluded.median()),
@@ -294,9 +362,81 @@ with open("stats.json", "w") as f:
                "real_E": float(REAL_E), "real_M": float(REAL_M),
                "cf_below": float(CF_BE), "miss_pct": float(MISS_PCT),
                "z_E": float(Z_E), "z_M": float(Z_M),
-               "corr_EM": CORR_EM}, f, indent=2)
+               "corr_EM": CORR_EM},
+              f, indent=2)
+
+print("\nwrote cf, cliff (.csv.gz + .npy), stats.json")
+
+# ---- threshold scan: every 0.05 points, with a local placebo band --------
+# The placebo section uses 21 integer thresholds because each was a full refit
+# once; the engine makes every threshold cheap. The band at t is the 2.5-97.5th
+# percentile of the scan within 10 points of t (at least 3 away from t and from
+# both real rules), so it widens where the density is high. Neighbouring
+# thresholds share bins, so scan values are strongly correlated: n_distinct,
+# not n, is closer to the number of independent placebos. With --explore only:
+# not in the spec, so written to scan and explore.json, not stats.json, and the
+# only check is that the scan reproduces the integer placebos.
+if EXPLORE:
+    print("\nSCAN (every 0.05 points; --explore; not checked)")
+    ST = np.round(np.arange(SCAN_LO, SCAN_HI + SCAN_STEP / 2, SCAN_STEP), 2)
+    SC = ENGINE.scan(ST, BW, DEG, W)
+    ss = SC[:, 0] + SC[:, 1]
+    on = np.isin(ST, PLACEBO_T) & (ST > 22)     # t = 22 clips at 10, not 9
+    check("scan vs integer placebos, max |diff|",
+          float(np.abs(ss[on] - pl[np.isin(PLACEBO_T, ST[on])]).max()), 0.0, 1e-6)
+    ENV = bunching.envelope(ST, ss, skip=(CLIFF, 10.0))
+    spl = ss[(ST >= 22) & (ST <= 48) & (np.abs(ST - CLIFF) >= 3)]
+    SCAN_Z = (REAL - spl.mean()) / spl.std()
+    # other notches: runs of thresholds whose statistic clears the local band
+    hot = (ss > ENV[:, 1]) & (np.abs(ST - CLIFF) >= 3) & (np.abs(ST - 10.0) >= 3)
+    runs = np.split(np.flatnonzero(hot), np.flatnonzero(np.diff(np.flatnonzero(hot)) > 1) + 1)
+    NOTCHES = [[float(ST[r[np.argmax(ss[r])]]), float(ss[r].max())] for r in runs if len(r)]
+    print(f"    {len(ST)} thresholds; placebos in [22, 48]: {len(spl)} "
+          f"({len(np.unique(spl))} distinct), z of the real cliff {SCAN_Z:.2f}")
+    print("    above the local band away from 10% and 33-1/3%: "
+          + (", ".join(f"{t:.2f} ({v:+.1f})" for t, v in NOTCHES) or "none"))
+    intermediate.save("scan", pd.DataFrame({"t": ST, "E": SC[:, 0], "M": SC[:, 1],
+                                            "displacement": ss, "band_lo": ENV[:, 0],
+                                            "band_hi": ENV[:, 1]}))
+
+# ---- the integration constraint: the same inference, mass-preserving -----
+# With --explore only: not in the spec, so written to explore.json, not
+# stats.json, and the only check is that the batched engine reproduces
+# parts(mode="mass").
+if EXPLORE:
+    print("\nINTEGRATION CONSTRAINT (mass-preserving counterfactual; --explore; not checked)")
+    MASS = parts(p, CLIFF, LO, HI, mode="mass")
+    check("engine vs parts(mode='mass'), max |diff|",
+          float(np.abs(ENGINE.evaluate([SPEC], "mass")[0] - MASS).max()), 0.0, 1e-6)
+    MASS_E, MASS_M, MASS_CF_BE, _ = MASS
+    MPP = ENGINE.evaluate(PLACEBO, "mass")
+    mpl = MPP[:, 0] + MPP[:, 1]
+    MASS_Z = (MASS_E + MASS_M - mpl.mean()) / mpl.std()
+    MGE = ENGINE.evaluate([(CLIFF, LO, HI, bw, deg, W) for bw, deg in GRID], "mass")
+    mg = MGE[:, 0] + MGE[:, 1]
+    # same seed and batches, so these are the same resampled histograms as the
+    # free-fit CI
+    mb = np.concatenate(run_tasks(bunching.boot_task, BOOT_BATCHES, BOOT_SEED, {"p": p},
+                                  args=(SPEC, BOOT_N // BOOT_BATCHES, "mass"),
+                                  workers=WORKERS))
+    MASS_BLO, MASS_BHI = np.percentile(mb[:, 0] + mb[:, 1], [2.5, 97.5])
+    print(f"    E {MASS_E:7.1f}    M {MASS_M:7.1f}    E+M {MASS_E + MASS_M:7.1f}"
+          f"    M as % of expected below {MASS_M / MASS_CF_BE * 100:5.1f}")
+    print(f"    z vs placebo {MASS_Z:5.2f}    bootstrap E+M [{MASS_BLO:.1f}, {MASS_BHI:.1f}]"
+          f"    grid [{mg.min():.1f}, {mg.max():.1f}], {(mg > 0).sum()}/12 positive")
+
+    with open("explore.json", "w") as f:
+        json.dump({"scan": {"step": SCAN_STEP, "n": int(len(ST)), "z": float(SCAN_Z),
+                            "n_placebo": int(len(spl)),
+                            "n_distinct": int(len(np.unique(spl))), "notches": NOTCHES},
+                   "mass": {"E": float(MASS_E), "M": float(MASS_M),
+                            "cf_below": float(MASS_CF_BE), "z": float(MASS_Z),
+                            "placebos": [[t, float(s)] for t, s in zip(PLACEBO_T, mpl)],
+                            "boot_lo": float(MASS_BLO), "boot_hi": float(MASS_BHI),
+                            "grid": [[bw, deg, float(s)] for (bw, deg), s in zip(GRID, mg)]}},
+                  f, indent=2)
+    print("\nwrote scan (.csv.gz + .npy), explore.json")
 
-print("\nwrote cf.csv.gz, cliff.csv.gz, stats.json")
 if FAILURES:
     print(f"\n{len(FAILURES)} SPEC MISMATCH(ES) — the script is wrong, not the spec:")
     for f_ in FAILURES:
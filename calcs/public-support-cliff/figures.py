@@ -4,13 +4,14 @@
 
 NO PANDAS — deliberately. compute.py runs under an env with pandas; this runs
 under one with matplotlib, and on this machine no interpreter has both (same as
-the below-zero and who-pays siblings). Hence np.genfromtxt and all-numeric
-intermediates.
+the below-zero and who-pays siblings). Hence all-numeric intermediates, read
+with ../soilib/intermediate.py (numpy only): the .npy memory-mapped, or the
+.csv.gz.
 
 Run:
   /opt/homebrew/Caskroom/miniforge/base/envs/qchem/bin/python figures.py
 
-Reads cf.csv.gz, cliff.csv.gz, stats.json (written by compute.py). Writes:
+Reads cf, cliff, stats.json (written by compute.py). Writes:
   images/2026-07-15-public-support-cliff-hero.png          Figure 1 (1200x630)
   images/2026-07-15-public-support-cliff-distribution.png  Figure 2
   images/2026-07-15-public-support-cliff-placebo.png       Figure 3
@@ -18,10 +19,16 @@ Reads cf.csv.gz, cliff.csv.gz, stats.json (written by compute.py). Writes:
 """
 
 import json
+import pathlib
+import sys
+
 import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import intermediate
+
 INK = "#143f33"
 TEAL = "#2f7da3"
 TEAL_LIFT = "#5b9fc0"
@@ -40,8 +47,8 @@ mpl.rcParams.update({
 OUT = "../../images/2026-07-15-public-support-cliff-{}.png"
 CLIFF = 100.0 / 3.0
 
-cf = np.genfromtxt("cf.csv.gz", delimiter=",", names=True)
-cl = np.genfromtxt("cliff.csv.gz", delimiter=",", names=True)
+cf = intermediate.load("cf")
+cl = intermediate.load("cliff")
 stats = json.load(open("stats.json"))
 
 mid, obs, cfv = cf["mid"], cf["obs"], cf["cf"]
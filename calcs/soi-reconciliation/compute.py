@@ -60,17 +60,23 @@ SOURCES
   https://www.irs.gov/pub/irs-soi/22eo01.xlsx
   https://www.irs.gov/pub/irs-soi/23eoextract990.zip
 Run from calcs/soi-reconciliation/.  Deterministic; no random seed needed.
+`python3 compute.py --explore` also prints what is not checked against the post
+(after the checked figures and reconciliation.json): three more cuts of the
+CY2023 extract, and the same three cuts for every annual extract in ../data/.
 """
 
 import json
 import pathlib
+import sys
 
-import openpyxl
-import pandas as pd
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import soitable, stream
 
 DATA = pathlib.Path(__file__).resolve().parent.parent / "data"
 OUT = pathlib.Path(__file__).resolve().parent
 
+EXPLORE = "--explore" in sys.argv[1:]     # unchecked extras; see the docstring
+
 FAILURES = []
 
 
@@ -87,14 +93,7 @@ def check(label, got, want, tol):
 # SOI Table 1, TY2022, "Total" column (column 1). Published in THOUSANDS of
 # dollars; converted to dollars here so both sides are in the same unit.
 
-wb = openpyxl.load_workbook(DATA / "22eo01.xlsx", data_only=True)
-ws = wb["Sheet1"]
-rows = {}
-for r in range(6, ws.max_row + 1):
-    label = ws.cell(r, 1).value
-    total = ws.cell(r, 2).value
-    if label is not None and total is not None:
-        rows[str(label).strip()] = total
+rows = soitable.Table(DATA / "22eo01.xlsx", first=6).column(0)
 
 PUB = {
     "n": rows["Number of returns"],
@@ -125,32 +124,23 @@ check("program service revenue as % of revenue", 100 * PUB["prgmrev"] / PUB["rev
 
 # --------------------------------------------------------------------- ours --
 
-COLS = ["ein", "tax_pd", "subseccd", "totrevenue", "totassetsend",
-        "totliabend", "totnetassetend", "totcntrbgfts", "totfuncexpns"]
-
-df = pd.read_csv(DATA / "23eoextract990.zip", usecols=COLS, low_memory=False)
-df["ty"] = df.tax_pd // 100
-c3 = df[df.subseccd == 3].copy()
+# Only additive figures are needed from the extract, so it is streamed: chunk
+# by chunk, never held in memory (soilib/stream.py). Same numbers, to the
+# dollar, as reading it whole. Every cut is a membership flag (or one row per
+# EIN) in the same pass, so the extra cuts below cost no second read.
 
+SUMS = {"assets": "totassetsend", "liab": "totliabend", "netassets": "totnetassetend",
+        "rev": "totrevenue", "contrib": "totcntrbgfts", "exp": "totfuncexpns"}
+CUTS = {"pooled": stream.everything,
+        "ty2022": stream.tax_years(2022),
+        "dedup": stream.PerEIN("latest")}
+if EXPLORE:                              # printed at the end, not checked
+    CUTS.update({"earliest": stream.PerEIN("earliest"),
+                 "ty2021-22": stream.tax_years(2021, 2022),
+                 "dedup ty2022": stream.PerEIN("latest", within=stream.tax_years(2022))})
 
-def agg(frame):
-    return {
-        "n": len(frame),
-        "assets": frame.totassetsend.sum(),
-        "liab": frame.totliabend.sum(),
-        "netassets": frame.totnetassetend.sum(),
-        "rev": frame.totrevenue.sum(),
-        "contrib": frame.totcntrbgfts.sum(),
-        "exp": frame.totfuncexpns.sum(),
-    }
-
-
-CUTS = {
-    "pooled": c3,
-    "ty2022": c3[c3.ty == 2022],
-    "dedup": c3.sort_values("tax_pd").drop_duplicates("ein", keep="last"),
-}
-OURS = {name: agg(frame) for name, frame in CUTS.items()}
+T = stream.totals(DATA / "23eoextract990.zip", SUMS, cuts=CUTS)
+OURS = {k: T.cuts[k] for k in ("pooled", "ty2022", "dedup")}
 
 print("\nOUR CUTS (CY2023 extract, 501(c)(3) Form 990 filers)")
 check("pooled returns", OURS["pooled"]["n"], 261_146, 0)
@@ -160,14 +150,13 @@ check("excess rows over organizations", OURS["pooled"]["n"] - OURS["dedup"]["n"]
 
 # Distinguish the excess-row count from the number of rows actually involved in
 # a repeat, which is larger because some EINs appear more than twice.
-vc = c3.ein.value_counts()
-check("EINs appearing more than once", (vc > 1).sum(), 14_279, 0)
-check("rows involved in a repeat", vc[vc > 1].sum(), 30_360, 0)
-check("largest number of rows for one EIN", vc.max(), 14, 0)
+check("EINs appearing more than once", T.repeats["eins"], 14_279, 0)
+check("rows involved in a repeat", T.repeats["rows"], 30_360, 0)
+check("largest number of rows for one EIN", T.repeats["most"], 14, 0)
 
 # Every duplicate EIN is a distinct tax period -- organizations catching up on a
 # late filing, not the same return counted twice.
-assert len(c3) == len(c3.drop_duplicates(["ein", "tax_pd"])), \
+assert T.repeats["pairs"] == 0, \
     "found a genuine duplicate (same EIN and same tax period)"
 
 # ----------------------------------------------------------------- the gaps --
@@ -200,7 +189,7 @@ check("dedup revenue gap (%)", GAPS["dedup"]["rev"], -3.59, 0.02)
 
 # Worst-case absolute gap across the seven line items, per cut. This is the
 # number the post uses to rank the three cuts.
-for name in CUTS:
+for name in OURS:
     worst = max(abs(v) for v in GAPS[name].values())
     print(f"  worst-case gap, {name:8s} = {worst:5.2f}%")
 check("pooled worst-case gap (%)", max(abs(v) for v in GAPS["pooled"].values()), 4.97, 0.02)
@@ -265,4 +254,41 @@ payload = {
 print("\n" + ("ALL CHECKS PASSED" if not FAILURES else f"{len(FAILURES)} FAILURES"))
 for f in FAILURES:
     print("  " + f)
+
+# ------------------------------------------------------------ more cuts --
+# The other cuts of the same pass, against the same table: the earliest return
+# per EIN instead of the latest, two tax years pooled, and the latest return
+# among TY2022 filings only. With --explore only; printed, not checked.
+
+if EXPLORE:
+    print("\nMORE CUTS (--explore; not checked)")
+    for name in list(CUTS)[3:]:
+        got = T.cuts[name]
+        line = "  ".join(f"{k}={100 * (got[k] - PUB[k]) / PUB[k]:+6.2f}%"
+                         for k in ("n", "rev", "assets", "exp"))
+        print(f"  {name:12s} {line}")
+
+# ----------------------------------------------------- every extract year --
+# The same three cuts for every annual extract in ../data/ (NNeoextract990.csv
+# or .zip, 2012-2024), each against the tax year before its processing year.
+# Only the TY2022 table is in ../data/, so the other years are printed, not
+# checked, and only with --explore. An extract without a column this needs is
+# reported and skipped.
+
+if EXPLORE:
+    print("\nEVERY EXTRACT IN ../data/ (--explore; not checked)")
+    print(f"  {'file':22s} {'pooled':>8s} {'ty':>8s} {'dedup':>8s} {'dedup rev $B':>13s} {'share':>6s}")
+    need = {"rev": "totrevenue", "contrib": "totcntrbgfts"}
+    for src in sorted(DATA.glob("[0-9][0-9]eoextract990.*")):
+        year = 2000 + int(src.name[:2]) - 1
+        have = stream.header(src)
+        missing = [c for c in ["ein", "tax_pd", "subseccd", *need.values()] if c not in have]
+        if missing:
+            print(f"  {src.name:22s} (no {', '.join(missing)}; skipped)")
+            continue
+        t = T if src.name == "23eoextract990.zip" else stream.totals(src, need, year=year)
+        d = t.cuts["dedup"]
+        print(f"  {src.name:22s} {t.cuts['pooled']['n']:8,d} {t.cuts[f'ty{year}']['n']:8,d} "
+              f"{d['n']:8,d} {d['rev'] / 1e9:13,.1f} {100 * d['contrib'] / d['rev']:5.2f}%")
+
 assert not FAILURES, FAILURES
@@ -0,0 +1,12 @@
+"""Shared plumbing for the calcs/ scripts that read the IRS SOI extracts.
+
+Each post's compute.py stays a standalone, readable script; this package holds
+only the pieces several of them were copying — loading the extract, picking one
+return per EIN, and so on. Modules are imported by name
+(``from soilib import extract``) and nothing is re-exported here, so a
+figures.py running in the matplotlib-only env can import the numpy-only
+modules without dragging pandas in.
+
+The compute.py scripts put calcs/ on sys.path themselves; run them from their
+own directory as before.
+"""
@@ -0,0 +1,245 @@
+"""Every published SOI EO table in a directory, as one long indexed table.
+
+two-fifths-government and soi-reconciliation each read one year of one or two
+tables (22eo01.xlsx, 22eo03.xlsx). A question across years — government
+grants as a share of contributions, by asset class, 2012-2022 — meant a script
+per workbook. The catalog ingests a whole directory of them once:
+
+  python3 -m soilib.catalog ../data/soi              # build (from calcs/)
+  python3 -m soilib.catalog ../data/soi --table 1 "Government grants (contributions)"
+
+  cat = catalog.load("../data/soi")
+  years, gov = cat.matrix(1, "Government grants (contributions)")  # years x columns
+  _, con = cat.matrix(1, "Total contributions, gifts, and grants")
+  share = gov / con                # every year, every asset class, in dollars
+  cat.headers(1, 2022)             # what each column of that year is
+
+Files are named as the IRS names them, <yy>eo<nn>.xlsx: tax year 20yy, table
+nn (Table 1, 501(c)(3) by asset size; Table 3, by code section; ...). Each is
+read by soitable.py — every sheet, header rows kept for the headings, the
+parsed rows cached beside it — in a process pool, one workbook per task, so a
+directory of a decade's tables costs about what its slowest workbook does the
+first time, and the sidecars after that.
+
+THE STORE
+---------
+One row per (table, year, label, column) with a numeric cell, as .npy columns
+in ../data/cache/soi/catalog-<key>/, keyed by every workbook's sidecar name
+(so by its bytes) and the source of this module and what it imports:
+
+  table, year, column   int
+  label                 code into labels.json (the label as printed that year)
+  value                 float, in DOLLARS: the tables print money in thousands
+                        and are multiplied by 1,000 here; a row whose label
+                        starts "Number of" is a count and is left alone
+  key                   table, label, year, column packed into one int64;
+                        the rows are sorted by it
+
+so every query is an np.searchsorted on `key` and a slice. A column is its
+position across the workbook's sheets (0 = the first after the labels, the
+Total column); what it means — which asset class, which code section — is its
+heading, and can change between years, so headers() is the thing to check
+before lining columns up across years. A marker cell ("d", "*") is not stored.
+A label printed twice in one workbook (the same item under two headings)
+keeps, cell by cell, its last row, as soitable's column() does. Labels are as
+printed: an item SOI renames between years is two labels.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import pathlib
+import re
+import sys
+
+import numpy as np
+
+from soilib import soitable, store
+
+DATA = pathlib.Path(__file__).resolve().parent.parent / "data"
+NAME = re.compile(r"^(\d\d)eo(\d\d)\.xlsx$")
+_LABEL, _YEAR, _COL = 100_000, 10_000, 1_000       # key = ((t * L + l) * Y + y) * C + c
+
+
+def workbooks(directory):
+    """{path: (table, year)} for every <yy>eo<nn>.xlsx in `directory`."""
+    out = {}
+    for p in sorted(pathlib.Path(directory).iterdir()):
+        m = NAME.match(p.name)
+        if m:
+            out[p] = (int(m.group(2)), 2000 + int(m.group(1)))
+    return out
+
+
+def _read(path):
+    """[(headers, [(label, values), ...]), ...] for each sheet of `path`
+    that has data (pool task)."""
+    out = []
+    for sheet in soitable.sheets(path):
+        t = soitable.Table(path, sheet=sheet)
+        if t.data:
+            out.append((t.headers, t.data))
+    return out
+
+
+def _map(fn, items, workers):
+    workers = min(workers or os.cpu_count() or 1, len(items))
+    if workers <= 1 or "fork" not in mp.get_all_start_methods():
+        return [fn(i) for i in items]
+    with mp.get_context("fork").Pool(workers) as pool:
+        return pool.map(fn, items, chunksize=1)
+
+
+def _key(table, label, year, column):
+    return ((np.int64(table) * _LABEL + label) * _YEAR + year) * _COL + column
+
+
+def build(directory, workers=None):
+    """Ingest every workbook in `directory`. Returns the store's directory."""
+    books = workbooks(directory)
+    if not books:
+        raise FileNotFoundError(f"no <yy>eo<nn>.xlsx tables in {directory}")
+    names = [soitable.sidecar(p).name for p in books]
+    key = "\0".join([store.code_key(__file__), *names])
+    key = hashlib.sha256(key.encode()).hexdigest()[:16]
+    path = soitable.CACHE / f"catalog-{key}"
+    if path.exists():
+        return path
+    sheets = _map(_read, list(books), workers)    # parses, and writes each sidecar
+
+    code = {}
+    cols = {c: [] for c in ("table", "year", "label", "column", "value")}
+    headers = {}
+    for (table, year), book in zip(books.values(), sheets):
+        heads, offset = [], 0
+        for head, data in book:
+            width = len(head)
+            if offset + width > _COL:
+                raise ValueError(f"{offset + width} columns; the key holds {_COL}")
+            heads += head
+            for lab, vals in data:
+                scale = 1 if lab.startswith("Number of") else 1_000
+                for i, v in enumerate(vals):
+                    if isinstance(v, (int, float)) and not isinstance(v, bool):
+                        cols["table"].append(table)
+                        cols["year"].append(year)
+                        cols["label"].append(code.setdefault(lab, len(code)))
+                        cols["column"].append(offset + i)
+                        cols["value"].append(float(v) * scale)
+            offset += width
+        headers[f"{table}-{year}"] = heads
+    labels = list(code)
+    if len(labels) >= _LABEL:
+        raise ValueError(f"{len(labels):,} labels; the key holds {_LABEL:,}")
+
+    arrays = {"table": np.array(cols["table"], dtype=np.int16),
+              "year": np.array(cols["year"], dtype=np.int16),
+              "label": np.array(cols["label"], dtype=np.int32),
+              "column": np.array(cols["column"], dtype=np.int16),
+              "value": np.array(cols["value"], dtype=float)}
+    k = _key(arrays["table"], arrays["label"], arrays["year"], arrays["column"])
+    order = np.argsort(k, kind="stable")
+    order = order[np.r_[k[order][1:] != k[order][:-1], True]]    # repeated label: last row
+    arrays = {name: a[order] for name, a in arrays.items()}
+    arrays["key"] = k[order]
+
+    store.save_dir(path, arrays,
+                   {"labels.json": json.dumps({"labels": labels, "headers": headers})})
+    print(f"  catalogued {len(arrays['key']):,} cells from {len(books)} workbooks"
+          f" -> {path.name}")
+    return path
+
+
+class Catalog:
+    """A built store, memory-mapped. Queries return numpy arrays."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.cols = {f.stem: np.load(f, mmap_mode="r") for f in self.path.glob("*.npy")}
+        meta = json.loads((self.path / "labels.json").read_text())
+        self.labels, self._headers = meta["labels"], meta["headers"]
+        self._code = {lab: i for i, lab in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.cols["key"])
+
+    def _rows(self, table, label):
+        """The slice of rows of `label` in `table`, every year and column."""
+        if label not in self._code:
+            return slice(0, 0)
+        lo, hi = _key(table, self._code[label], 0, 0), _key(table, self._code[label] + 1, 0, 0)
+        return slice(*np.searchsorted(self.cols["key"], [lo, hi]))
+
+    def years(self, table):
+        """The years catalogued for `table`."""
+        return sorted(int(k.split("-")[1]) for k in self._headers if int(k.split("-")[0]) == table)
+
+    def headers(self, table, year):
+        """Each column's heading in that year's workbook."""
+        return self._headers[f"{table}-{year}"]
+
+    def value(self, table, year, label, column=0):
+        """One cell, in dollars (counts as counts); NaN if not published."""
+        if label not in self._code:
+            return np.nan
+        k = _key(table, self._code[label], year, column)
+        i = int(np.searchsorted(self.cols["key"], k))
+        if i == len(self) or self.cols["key"][i] != k:
+            return np.nan
+        return float(self.cols["value"][i])
+
+    def series(self, table, label, column=0):
+        """(years, values): one column of one line, year by year."""
+        r = self._rows(table, label)
+        at = self.cols["column"][r] == column
+        return np.asarray(self.cols["year"][r][at]), np.asarray(self.cols["value"][r][at])
+
+    def matrix(self, table, label):
+        """(years, values[year, column]) for one line of `table`, NaN where
+        a year has no such cell."""
+        r = self._rows(table, label)
+        year, col = np.asarray(self.cols["year"][r]), np.asarray(self.cols["column"][r])
+        years = np.unique(year)
+        out = np.full((len(years), int(col.max()) + 1 if len(col) else 0), np.nan)
+        out[np.searchsorted(years, year), col] = self.cols["value"][r]
+        return years, out
+
+    def frame(self):
+        """The whole store as a long DataFrame (pandas)."""
+        import pandas as pd
+
+        c = self.cols
+        return pd.DataFrame({"table": c["table"], "year": c["year"],
+                             "label": np.asarray(self.labels, dtype=object)[c["label"]],
+                             "column": c["column"], "value": c["value"]})
+
+
+def load(directory=DATA / "soi", workers=None):
+    """The catalog of `directory`, built (or brought up to date) on first use."""
+    return Catalog(build(directory, workers))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("directory", nargs="?", default=str(DATA / "soi"))
+    ap.add_argument("label", nargs="?", help="print this line, year by year")
+    ap.add_argument("--table", type=int, default=1)
+    ap.add_argument("-j", "--workers", type=int)
+    a = ap.parse_args(argv)
+    cat = load(a.directory, a.workers)
+    if a.label:
+        years, m = cat.matrix(a.table, a.label)
+        if not len(years):
+            raise SystemExit(f"no {a.label!r} in table {a.table}")
+        count = a.label.startswith("Number of")
+        for y, row in zip(years, m):
+            print(f"  {y}" + "".join(f"{'':>12}" if np.isnan(v) else f"{v:12,.0f}" if count
+                                     else f"{v / 1e9:12,.1f}" for v in row))
+        if not count:
+            print("  ($B)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
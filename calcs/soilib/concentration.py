@@ -0,0 +1,124 @@
+"""How concentrated a dollar column is: top/bottom shares, Lorenz, Gini, Theil.
+
+who-pays' concentration block sorted all of POP_REV to read three numbers off
+the ends (top 1%, top 10%, bottom 50% of revenue), and its top-1% table sorted
+again with nlargest. None of those needs the order INSIDE the top 1% or the
+bottom half — only which values fall on which side of a few ranks. np.partition
+gives exactly that, in linear time, for every rank at once:
+
+  c = Concentration(rev.totrevenue, top=(.01, .1), bottom=(.5,))
+  c.top[.01], c.bottom[.5]     share of the total held by the top 1%, bottom 50%
+  c.lorenz                     (population share, cumulative share) at
+                               resolution + 1 evenly spaced ranks
+  c.gini, c.theil              inequality indices
+
+HOW
+---
+Every rank a share needs — floor(n * p) from the bottom, n - floor(n * p) from
+the top — is passed to ONE np.partition as its kth list. Afterwards every
+element left of such a rank is <= every element right of it, so one
+cumulative sum over the partitioned array gives the exact sum of the k
+smallest at each of those ranks, and every share is a difference of two of
+them. The k in floor(n * p) is the one the scripts take with n // 100,
+n // 10, n // 2. Any number of shares costs one partition and one cumsum.
+
+The Lorenz curve and the Gini coefficient do need the whole order, and are
+computed on first use from one sort: the curve at `resolution` + 1 evenly
+spaced ranks, the Gini exactly (the trapezoid rule over every rank is exact
+for the empirical curve). Partitioning at a hundred ranks is no cheaper than
+numpy's sort, which is vectorised; at three it is. The Theil index,
+mean((x / mean) * ln(x / mean)), needs no order; it is NaN when any value is
+negative.
+
+NaN values are dropped, as in ECDF. For sums of whole dollars every partial
+sum is exact in float64 (below 2**53), so the shares equal the sorted
+computation's to the last bit.
+
+by_group() does the same within each group of a groups.Groups — one stable
+argsort of the group codes, then one Concentration per group's slice.
+top_rows() picks the rows DataFrame.nlargest(k) picks, by one partition.
+
+numpy only, like ecdf.py.
+"""
+
+import functools
+
+import numpy as np
+
+_SCALE = 10**9
+
+
+def _floor(n, p):
+    """floor(n * p) exactly, for p given to 9 decimals (0.01 * 2900 is 28.99...)."""
+    return n * int(round(p * _SCALE)) // _SCALE
+
+
+class Concentration:
+    """Shares, Lorenz curve, Gini and Theil of the values in `x`."""
+
+    def __init__(self, x, top=(), bottom=(), resolution=100):
+        x = np.asarray(x, dtype=float)
+        self.x = x = x[~np.isnan(x)]
+        n = self.n = len(x)
+        self.resolution = resolution
+        k_top = {p: n - _floor(n, p) for p in top}
+        k_bottom = {p: _floor(n, p) for p in bottom}
+        kth = sorted(k for k in {*k_top.values(), *k_bottom.values()} if 0 < k < n)
+        below = np.r_[0.0, np.cumsum(np.partition(x, kth) if kth else x)]
+        self.total = below[-1]
+        self.top = {p: (self.total - below[k]) / self.total for p, k in k_top.items()}
+        self.bottom = {p: below[k] / self.total for p, k in k_bottom.items()}
+
+    @functools.cached_property
+    def _below(self):
+        """Sum of the k smallest, for every k: one sort."""
+        return np.r_[0.0, np.cumsum(np.sort(self.x))]
+
+    @property
+    def lorenz(self):
+        """(population share, share of the total) at resolution + 1 ranks."""
+        ranks = np.arange(self.resolution + 1) * self.n // self.resolution
+        return ranks / max(self.n, 1), self._below[ranks] / self.total
+
+    @functools.cached_property
+    def gini(self):
+        cum = self._below / self.total
+        return float(1 - np.sum(cum[1:] + cum[:-1]) / max(self.n, 1))
+
+    @functools.cached_property
+    def theil(self):
+        x = self.x
+        if not self.n or np.any(x < 0):
+            return np.nan
+        r = x / (self.total / self.n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return float(np.mean(np.where(r > 0, r * np.log(r), 0.0)))
+
+
+def by_group(x, groups, **kwargs):
+    """[Concentration of x within group i for i in range(groups.k)];
+    `kwargs` as for Concentration."""
+    x = np.asarray(x, dtype=float)
+    order = np.argsort(groups.codes, kind="stable")
+    order = order[groups.codes[order] >= 0]
+    bounds = np.r_[0, np.cumsum(groups.sizes)]
+    return [Concentration(x[order[bounds[i]:bounds[i + 1]]], **kwargs)
+            for i in range(groups.k)]
+
+
+def top_rows(x, k):
+    """Positions (ascending) of the k largest values of x: the rows
+    DataFrame.nlargest(k) keeps — ties at the cut go to the earliest rows, and
+    NaN rows, earliest first, only when k exceeds the other rows."""
+    x = np.asarray(x, dtype=float)
+    nan = np.isnan(x)
+    ok = np.flatnonzero(~nan)
+    if k > len(ok):
+        return np.sort(np.r_[ok, np.flatnonzero(nan)[:k - len(ok)]])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    v = x[ok]
+    cut = np.partition(v, len(v) - k)[len(v) - k]
+    above = ok[v > cut]
+    ties = ok[v == cut][:k - len(above)]
+    return np.sort(np.r_[above, ties])
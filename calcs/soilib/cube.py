@@ -0,0 +1,317 @@
+"""The deduped extract pre-aggregated over the dimensions the posts slice by.
+
+The SOI posts cut one population the same few ways — subseccd, nonpfrea,
+below-zero's expense bands, who-pays' contribution-share bands, the
+hospital and school flags, below zero or not — and every new question was one
+more mask over the row-level frame and one more reduction. The cube
+aggregates every combination of those once, so a question is a lookup:
+
+  python3 -m soilib.cube --build data/24eoextract990.csv        # once (pandas)
+  python3 -m soilib.cube school=Y cs_band=25-50 --median honest
+
+  cube = Cube()
+  s = cube.where(school=True, cs_band="25-50")
+  s.n, s.sum("totrevenue"), s.median("honest")
+  {band: t.median("honest") for band, t in s.by("exp_band").items()}
+
+(from calcs/). A slice names, per dimension, the level or levels it keeps
+(several levels of one dimension are OR-ed, dimensions are AND-ed); by()
+rolls a slice up along one dimension. Levels are labels, as in DIMS; a flag
+takes True/False or "Y"/"N", a code its number. Rows with no level — a missing
+nonpfrea, a contribution share outside [0, 100], no honest months — fall in
+the "NA" level, so every slice of one dimension adds up to the whole.
+
+WHAT A CELL HOLDS
+-----------------
+One cell per combination of levels that has any rows (a few percent of
+the dimensions' hundreds of thousands of combinations), and per cell:
+
+  n          rows
+  sum(c)     the dollar columns SUMS, blank = 0; whole dollars, so every
+             partial sum is exact and a slice's sum is the frame's .sum()
+  sketch(m)  a histogram of the metric over log-spaced buckets (METRICS)
+
+A sketch bucket i > 0 holds the values in (MIN * g**(i-1), MIN * g**i],
+g = (1 + ALPHA) / (1 - ALPHA), bucket -i their negatives, bucket 0 everything
+within MIN of zero. Buckets are the same for every cell, so merging cells is
+adding their counts, and a slice's quantile is read off the merged histogram:
+each order statistic is taken as its bucket's midpoint, which is within ALPHA
+(0.1%), relative, of the true value, and interpolated between the two nearest
+ranks as ECDF.quantile does. A median of 7.38 honest months comes back within
+0.01 of it. The sketches are the only approximate figures here; n and the
+sums are exact.
+
+STORAGE
+-------
+build() writes ../data/cache/cube/: cells.npy (each non-empty cell's level
+per dimension), n.npy, one sum.<column>.npy per dollar column, and per
+metric three parallel arrays — <metric>.cell, <metric>.bucket,
+<metric>.count — with one entry per non-empty (cell, bucket) pair, so the
+store never outgrows the rows it summarises. A slice is a boolean mask over
+the cells; a sum is a masked sum over n or sum.*, a quantile one bincount of
+the selected entries. Each answers in about a millisecond, without the
+extract.
+
+Querying needs only numpy and the standard library, like lookup.py; building
+is the one step that reads the extract, and imports pandas to do it.
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+
+import numpy as np
+
+from soilib import store
+from soilib.groups import band_codes, key_codes
+
+CUBE = pathlib.Path(__file__).resolve().parent.parent / "data" / "cache" / "cube"
+
+EXP_EDGES = [0, 5e5, 5e6, 5e7, np.inf]                 # below-zero's bands
+EXP_BANDS = ["<$500K", "$500K-5M", "$5M-50M", ">$50M"]
+CS_BINS = [0, 10, 25, 50, 75, 90, 100.01]                # who-pays' bands, right-closed
+CS_BANDS = ["0-10", "10-25", "25-50", "50-75", "75-90", "90-100"]
+DIMS = ["subseccd", "nonpfrea", "exp_band", "cs_band", "hospital", "school",
+        "below_zero"]
+NA = "NA"
+
+SUMS = ["totrevenue", "totcntrbgfts", "totfuncexpns", "totassetsend", "totnetassetend"]
+METRICS = ["honest", "honest_bond", "cashmonths", "naive", "cs", "totrevenue"]
+
+ALPHA = 0.001
+MIN = 1e-6
+_LOG_G = np.log((1 + ALPHA) / (1 - ALPHA))
+
+
+def cut_codes(x, bins):
+    """pd.cut(x, bins, labels=False, include_lowest=True) as codes: i where
+    bins[i] < x <= bins[i+1] (RIGHT-closed; the first band also takes
+    bins[0]); -1 outside, or NaN."""
+    x = np.asarray(x, dtype=float)
+    codes = np.searchsorted(np.asarray(bins, dtype=float), x, side="left") - 1
+    codes[x == bins[0]] = 0
+    codes[codes >= len(bins) - 1] = -1
+    return codes
+
+
+def buckets(x):
+    """Sketch bucket of each value of x (see the module docstring)."""
+    x = np.asarray(x, dtype=float)
+    a = np.abs(x)
+    out = np.zeros(x.shape, dtype=np.int32)
+    big = a > MIN
+    out[big] = np.sign(x[big]) * np.ceil(np.log(a[big] / MIN) / _LOG_G)
+    return out
+
+
+def midpoints(b):
+    """The value each bucket stands for: within ALPHA of all it holds."""
+    b = np.asarray(b)
+    return np.sign(b) * MIN * 2 * np.exp(np.abs(b) * _LOG_G) / (1 + np.exp(_LOG_G))
+
+
+def _flag(s):
+    return np.asarray(s, dtype=bool).astype(np.intp)
+
+
+def build(src, path=CUBE):
+    """Build the cube for the extract at `src` (pandas; once per extract)."""
+    from soilib import extract, reserve, session
+
+    path = pathlib.Path(path)
+    stamp = {"extract": extract.file_hash(src), "code": store.code_key(__file__)}
+    if (path / "meta.json").exists() and json.loads((path / "meta.json").read_text())["stamp"] == stamp:
+        return path
+
+    df = session.latest(src, ["EIN", "tax_pd", "subseccd", "nonpfrea", "totrevenue",
+                              "totcntrbgfts", "totfuncexpns", "totassetsend",
+                              "totnetassetend", "operatehosptlcd", "operateschools170cd"])
+    res = reserve.load(src)              # the same deduped rows, in the same order
+    assert np.array_equal(res.EIN.to_numpy(dtype=np.int64), df.EIN.to_numpy(dtype=np.int64))
+
+    rev = df.totrevenue.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cs = np.nan_to_num(df.totcntrbgfts.to_numpy(dtype=float)) / rev * 100
+    cs[~((rev > 0) & (cs >= 0) & (cs <= 100))] = np.nan
+    honest = res.honest.to_numpy()
+
+    levels, codes = {}, {}
+    for dim in ("subseccd", "nonpfrea"):
+        x = df[dim].to_numpy(dtype=float)
+        keys = np.unique(x[~np.isnan(x)]).astype(np.int64)
+        levels[dim], codes[dim] = [str(k) for k in keys], key_codes(x, keys)
+    levels["exp_band"] = EXP_BANDS
+    codes["exp_band"] = band_codes(df.totfuncexpns.to_numpy(dtype=float), EXP_EDGES)
+    levels["cs_band"], codes["cs_band"] = CS_BANDS, cut_codes(cs, CS_BINS)
+    levels["hospital"], codes["hospital"] = ["N", "Y"], _flag(df.operatehosptlcd)
+    levels["school"], codes["school"] = ["N", "Y"], _flag(df.operateschools170cd)
+    bz = np.where(np.isnan(honest), -1, honest <= 0)
+    levels["below_zero"], codes["below_zero"] = ["N", "Y"], bz.astype(np.intp)
+
+    # every row's cell: its level per dimension (no level -> the NA level, last)
+    shape = [len(levels[d]) + 1 for d in DIMS]
+    coords = [np.where(codes[d] < 0, len(levels[d]), codes[d]) for d in DIMS]
+    cells, row_cell = np.unique(np.ravel_multi_index(coords, shape), return_inverse=True)
+    ncell = len(cells)
+
+    cols = {"cells": np.stack(np.unravel_index(cells, shape), axis=1).astype(np.int16),
+            "n": np.bincount(row_cell, minlength=ncell).astype(np.int64)}
+    for c in SUMS:
+        cols[f"sum.{c}"] = np.bincount(row_cell, np.nan_to_num(df[c].to_numpy(dtype=float)),
+                                       minlength=ncell)
+    values = {"honest": honest, "honest_bond": res.honest_bond.to_numpy(),
+              "cashmonths": res.cashmonths.to_numpy(), "naive": res.naive.to_numpy(),
+              "cs": cs, "totrevenue": rev}
+    for m in METRICS:
+        v = values[m]
+        ok = np.flatnonzero(np.isfinite(v))
+        b = buckets(v[ok]).astype(np.int64)
+        lo = int(b.min()) if len(b) else 0
+        span = int(b.max()) - lo + 1 if len(b) else 1
+        keys, count = np.unique(row_cell[ok] * span + (b - lo), return_counts=True)
+        cols[f"{m}.cell"] = (keys // span).astype(np.int32)
+        cols[f"{m}.bucket"] = (keys % span + lo).astype(np.int32)
+        cols[f"{m}.count"] = count.astype(np.int32)
+
+    meta = {"stamp": stamp, "extract": pathlib.Path(src).name, "rows": len(df),
+            "dims": DIMS, "levels": {d: levels[d] + [NA] for d in DIMS},
+            "sums": SUMS, "metrics": METRICS, "alpha": ALPHA, "min": MIN}
+    store.save_dir(path, cols, {"meta.json": json.dumps(meta, indent=1)})
+    print(f"  aggregated {len(df):,} rows from {pathlib.Path(src).name} into"
+          f" {ncell:,} cells -> {path}")
+    return path
+
+
+class Cube:
+    """The built cube, memory-mapped. where() slices it."""
+
+    def __init__(self, path=CUBE):
+        path = pathlib.Path(path)
+        if not (path / "meta.json").exists():
+            raise FileNotFoundError(f"no cube at {path}; run with --build <extract> first")
+        self.meta = json.loads((path / "meta.json").read_text())
+        self.cols = {f.stem: np.load(f, mmap_mode="r") for f in path.glob("*.npy")}
+        self.dims, self.levels = self.meta["dims"], self.meta["levels"]
+        self.cells = np.asarray(self.cols["cells"])
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _level(self, dim, level):
+        labels = self.levels[dim]
+        if isinstance(level, (bool, np.bool_)):
+            level = "Y" if level else "N"
+        elif level is None:
+            level = NA
+        elif isinstance(level, (int, np.integer)):
+            level = str(level)
+        if level not in labels:
+            raise KeyError(f"{dim} has no level {level!r}; levels: {labels}")
+        return labels.index(level)
+
+    def where(self, **levels):
+        """The slice keeping, for each dimension named, the given level or
+        list of levels; every level of the rest."""
+        return Slice(self, np.ones(len(self), dtype=bool)).where(**levels)
+
+
+class Slice:
+    """A set of the cube's cells: its counts, sums and quantiles."""
+
+    def __init__(self, cube, mask):
+        self.cube, self.mask = cube, mask
+
+    def where(self, **levels):
+        """This slice, further restricted (see Cube.where)."""
+        mask = self.mask.copy()
+        for dim, want in levels.items():
+            if dim not in self.cube.dims:
+                raise KeyError(f"no dimension {dim!r}; dimensions: {self.cube.dims}")
+            want = want if isinstance(want, (list, tuple, set)) else [want]
+            codes = [self.cube._level(dim, w) for w in want]
+            mask &= np.isin(self.cube.cells[:, self.cube.dims.index(dim)], codes)
+        return Slice(self.cube, mask)
+
+    def by(self, dim):
+        """{level: slice} along `dim`, for the levels with rows."""
+        out = {}
+        for level in self.cube.levels[dim]:
+            s = self.where(**{dim: level})
+            if s.n:
+                out[level] = s
+        return out
+
+    @property
+    def n(self):
+        return int(np.asarray(self.cube.cols["n"])[self.mask].sum())
+
+    def sum(self, column):
+        """Sum of a dollar column (one of SUMS) over the slice's rows."""
+        return float(np.asarray(self.cube.cols[f"sum.{column}"])[self.mask].sum())
+
+    def _histogram(self, metric):
+        """(buckets, counts) of the metric's merged sketch, ascending."""
+        c = self.cube.cols
+        keep = self.mask[np.asarray(c[f"{metric}.cell"])]
+        b = np.asarray(c[f"{metric}.bucket"])[keep]
+        if not len(b):
+            return b, b
+        lo = int(b.min())
+        counts = np.bincount(b - lo, np.asarray(c[f"{metric}.count"])[keep])
+        at = np.flatnonzero(counts)
+        return at + lo, counts[at].astype(np.int64)
+
+    def count(self, metric):
+        """How many of the slice's rows have the metric."""
+        return int(self._histogram(metric)[1].sum())
+
+    def quantile(self, metric, q):
+        """Linear-interpolated quantile(s) of the metric at q in [0, 1], from
+        the sketch (within ALPHA, relative); NaN if no row has it."""
+        b, counts = self._histogram(metric)
+        q = np.asarray(q, dtype=float)
+        m = int(counts.sum())
+        if not m:
+            return np.full(q.shape, np.nan)[()]
+        virtual = (m - 1) * q
+        lo = np.floor(virtual)
+        t = virtual - lo
+        lo = np.clip(lo.astype(np.int64), 0, m - 1)
+        ends = np.cumsum(counts)              # rank r is in bucket searchsorted(ends, r, "right")
+        x = midpoints(b)
+        a = x[np.searchsorted(ends, lo, side="right")]
+        z = x[np.searchsorted(ends, np.minimum(lo + 1, m - 1), side="right")]
+        return (a + (z - a) * t)[()]
+
+    def median(self, metric):
+        return self.quantile(metric, 0.5)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("where", nargs="*", metavar="DIM=LEVEL[,LEVEL]",
+                    help="slice to describe (default: everything)")
+    ap.add_argument("--build", metavar="EXTRACT", help="(re)build the cube first")
+    ap.add_argument("--median", metavar="METRIC", action="append", default=[],
+                    help="print the slice's median of METRIC (repeatable)")
+    ap.add_argument("--by", metavar="DIM", help="one line per level of DIM")
+    a = ap.parse_args(argv)
+    if a.build:
+        build(a.build)
+    if a.build and not (a.where or a.median or a.by):
+        return
+    cube = Cube()
+    levels = {}
+    for w in a.where:
+        dim, _, want = w.partition("=")
+        levels[dim] = want.split(",")
+    s = cube.where(**levels)
+    rows = s.by(a.by) if a.by else {" ".join(a.where) or "all": s}
+    for label, t in rows.items():
+        print(f"  {label:>16}  n={t.n:>9,}" + "".join(
+            f"  median {m} {t.median(m):,.2f}" for m in a.median))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
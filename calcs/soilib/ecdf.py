@@ -0,0 +1,79 @@
+"""Empirical distribution of one series: sort once, then answer in O(log n).
+
+The posts describe every series the same way — a handful of percentiles and
+"share at or below N months" for a list of N — and each of those used to be
+its own np.percentile (a partition) or (s <= thr).mean() (a full scan). An
+ECDF sorts the values once; after that a percentile is an index lookup and a
+threshold share is a binary search, and both take arrays of queries:
+
+    e = ECDF(c3.honest)
+    p10, p25, p50, p75, p90 = e.percentile([10, 25, 50, 75, 90])
+    e.share("<=", [0, 1, 3, 6, 12, 24])        # one searchsorted, six answers
+
+Conventions, chosen to reproduce what the scripts computed before:
+  * percentile/quantile use numpy's default ("linear") interpolation, with
+    the same floating-point steps as np.percentile.
+  * NaN is excluded from percentiles (as pandas' .median()/.quantile() do)
+    but stays in the denominator of shares, where it is never "<=" anything
+    — exactly (s <= thr).mean() on a series holding NaN.
+
+numpy only, so the matplotlib-only figures.py env can use it too.
+"""
+
+import numpy as np
+
+_SIDE = {"<=": "right", "<": "left", ">=": "left", ">": "right"}
+
+
+class ECDF:
+    """Sorted copy of `values` plus the queries the posts ask of it.
+
+    Pass presorted=True when `values` is already ascending with any NaN at
+    the end (e.g. a slice of a larger sorted array) to skip the sort; no copy
+    is made in that case.
+    """
+
+    def __init__(self, values, presorted=False):
+        x = np.asarray(values, dtype=float)
+        if not presorted:
+            x = np.sort(x)                      # NaN sorts to the end
+        self.n = len(x)                         # share denominator, NaN included
+        self.x = x[:np.searchsorted(x, np.nan)]  # numpy orders NaN last
+
+    def __len__(self):
+        return self.n
+
+    def quantile(self, q):
+        """Linear-interpolated quantile(s) at q in [0, 1]; NaN if no values."""
+        x, q = self.x, np.asarray(q, dtype=float)
+        if len(x) == 0:
+            return np.full(q.shape, np.nan)[()]
+        virtual = (len(x) - 1) * q
+        lo = np.floor(virtual)
+        t = virtual - lo
+        lo = np.clip(lo.astype(np.intp), 0, len(x) - 1)
+        a, b = x[lo], x[np.minimum(lo + 1, len(x) - 1)]
+        # np.lerp's formulation: from the nearer end, so t=1 lands on b exactly
+        diff = b - a
+        out = np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+        return out[()]
+
+    def percentile(self, p):
+        return self.quantile(np.asarray(p, dtype=float) / 100)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def count(self, op, t):
+        """How many values satisfy `value <op> t`, op in <=, <, >=, >, ==.
+        Vectorised over t."""
+        t = np.asarray(t, dtype=float)
+        if op == "==":
+            return (np.searchsorted(self.x, t, "right")
+                    - np.searchsorted(self.x, t, "left"))[()]
+        k = np.searchsorted(self.x, t, _SIDE[op])
+        return (k if op[0] == "<" else len(self.x) - k)[()]
+
+    def share(self, op, t):
+        """count(op, t) / n — the same number as (s <op> t).mean()."""
+        return self.count(op, t) / self.n
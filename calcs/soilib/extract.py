@@ -0,0 +1,146 @@
+"""Columnar on-disk cache of the SOI annual extract.
+
+The extract ships as one ~250-column CSV (or a zip of one). Every compute.py
+used to call ``pd.read_csv(src, usecols=...)`` and parse the whole text file to
+keep a dozen columns, so a full rerun of the SOI posts was dominated by CSV
+parsing. Here the file is parsed ONCE into Parquet, keyed by a SHA-256 of the
+source bytes, and each script then reads only its own columns.
+
+  read_extract(src, columns)   drop-in for pd.read_csv(src, usecols=columns)
+
+The cache lives in ../data/cache/ (next to the extracts, so it is never
+published with the site) as ``<stem>-<hash16>.parquet``. A new or re-downloaded
+extract hashes differently and is converted afresh; stale entries are just
+never read again. Delete the directory to reclaim the space.
+
+Column types come from schema.py and are applied as the file is parsed, so
+the cache holds the compact types (int32 EINs, categorical codes, boolean
+flags) and every read returns them. Money columns are stored narrower still
+where that is exact and read back as int64/float64 (schema.widen). The cache
+name carries schema.KEY too.
+
+Parquet needs pyarrow. Without it read_extract falls back to the CSV parse it
+replaces, so the scripts still run — only slower.
+"""
+
+import functools
+import hashlib
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from soilib import schema
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:           # optional: without it, every read is a CSV parse
+    pq = None
+
+DATA = pathlib.Path(__file__).resolve().parent.parent / "data"
+CACHE = DATA / "cache"
+CHUNK = 50_000      # rows per parse in convert
+
+
+def file_hash(path):
+    """SHA-256 of a file's bytes, hex. Streams, so a 250MB extract costs well
+    under a second and no memory; memoised per process on (path, size, mtime),
+    so the several loaders keyed on one extract hash it once."""
+    st = os.stat(path)
+    return _sha256(str(pathlib.Path(path).resolve()), st.st_size, st.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def _sha256(path, size, mtime_ns, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_path(src):
+    """Where the Parquet copy of `src` lives (whether or not it exists yet)."""
+    src = pathlib.Path(src)
+    stem = src.name.split(".")[0]
+    return CACHE / f"{stem}-{file_hash(src)[:16]}-{schema.KEY}.parquet"
+
+
+def convert(src, dest=None, chunk=CHUNK):
+    """Parse `src` and write it as Parquet. Returns the path.
+
+    The file is parsed in `chunk`-row pieces, twice: schema.survey reads it
+    once to fix every column's type for the whole file (so a column is never
+    int in one chunk and str in the next), then each chunk is parsed with those
+    types and its money columns narrowed before the next is read. The whole
+    file is never held as parsed text or in the read types, only in the stored
+    ones. Written to a temp name and renamed, so an interrupted run never
+    leaves a truncated cache entry behind, and two processes converting at
+    once never write the same file.
+    """
+    dest = pathlib.Path(dest) if dest is not None else cache_path(src)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    header = pd.read_csv(src, nrows=0).columns
+    parse, store = schema.survey(pd.read_csv(src, chunksize=chunk,
+                                             dtype=schema.parse_dtypes(header)))
+    pieces = {c: [] for c in header}
+    for df in pd.read_csv(src, chunksize=chunk, dtype=parse):
+        for c in header:    # copies, so nothing keeps the parsed chunk alive
+            pieces[c].append(df[c].astype(store.get(c, df[c].dtype), copy=True))
+        del df
+    df = pd.DataFrame({c: _join(pieces.pop(c)) for c in header}, copy=False)
+    df = schema.apply(df)
+    tmp = dest.with_suffix(f".{os.getpid()}.tmp")
+    df.to_parquet(tmp, index=False)
+    tmp.replace(dest)
+    return dest
+
+
+def _join(pieces):
+    """One column from its chunks; a text column's categories are the sorted
+    union of the chunks', as one whole-file parse to category would give."""
+    if isinstance(pieces[0].dtype, pd.CategoricalDtype):
+        return union_categoricals(pieces, sort_categories=True)
+    return np.concatenate([p.to_numpy() for p in pieces])
+
+
+def read_extract(src, columns):
+    """Columns `columns` of the extract at `src`, as a DataFrame.
+
+    Same rows, same order and the same default RangeIndex as
+    pd.read_csv(src, usecols=columns), with schema.py's types; columns come
+    back in file order, as usecols gives them. The first call for a given
+    extract pays for the conversion; every later call reads Parquet.
+    """
+    if pq is None:
+        print(f"  (pyarrow not installed; parsing {pathlib.Path(src).name} as CSV)")
+        return schema.apply(pd.read_csv(src, usecols=columns, low_memory=False,
+                                        dtype=schema.parse_dtypes(columns)))
+    path = cache_path(src)
+    if not path.exists():
+        print(f"  converting {pathlib.Path(src).name} -> {path.name} (one time)")
+        convert(src, path)
+    names = pq.read_schema(path).names
+    missing = set(columns) - set(names)
+    if missing:
+        raise ValueError(f"{pathlib.Path(src).name} has no column(s) {sorted(missing)}")
+    order = [c for c in names if c in set(columns)]
+    return schema.widen(pd.read_parquet(path, columns=order))
+
+
+def columns(src):
+    """Every column name of the extract at `src`, in file order."""
+    path = cache_path(src)
+    if pq is not None and path.exists():
+        return pq.read_schema(path).names
+    return list(pd.read_csv(src, nrows=0).columns)
+
+
+def n_rows(src):
+    """Row count of the extract at `src` — from the Parquet footer when cached."""
+    path = cache_path(src)
+    if pq is not None and path.exists():
+        return pq.read_metadata(path).num_rows
+    return len(pd.read_csv(src, usecols=[0]))
@@ -0,0 +1,44 @@
+"""All-numeric intermediates, written by compute.py and read by figures.py.
+
+figures.py runs in an env with matplotlib and no pandas, so the intermediates
+have always been gzipped CSV read back with np.genfromtxt — a pure-Python
+text parser that takes tens of seconds on the 240k-row mix.csv.gz. save()
+still writes that CSV (a reader can open it in anything) and, beside it, the
+same table as an uncompressed .npy structured array; load() memory-maps the
+.npy, which costs nothing until a column is touched.
+
+    intermediate.save("mix", out)        # compute.py: mix.csv.gz + mix.npy
+    mix = intermediate.load("mix")       # figures.py: mix["cs"], mix["npr"]
+
+Every field is float64, which is what genfromtxt returns, so figures.py sees
+the same arrays either way. load() falls back to the CSV when there is no .npy
+or when the CSV is newer (a run of an older compute.py). The gzip header's
+timestamp is pinned, so the same table always gives the same bytes and
+pipeline.py can tell an unchanged rerun from a changed one. numpy only.
+"""
+
+import pathlib
+
+import numpy as np
+
+
+def save(name, frame):
+    """Write DataFrame `frame` as `name`.csv.gz and `name`.npy."""
+    frame.to_csv(f"{name}.csv.gz", index=False,
+                 compression={"method": "gzip", "mtime": 0})
+    rec = np.empty(len(frame), dtype=[(str(c), "f8") for c in frame.columns])
+    for c in frame.columns:
+        rec[str(c)] = frame[c].to_numpy(dtype=float)
+    tmp = pathlib.Path(f"{name}.npy.tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, rec)
+    tmp.replace(f"{name}.npy")
+
+
+def load(name):
+    """The table `name` as a structured array: `name`.npy memory-mapped when
+    it is at least as new as `name`.csv.gz, else parsed from the CSV."""
+    npy, csv = pathlib.Path(f"{name}.npy"), pathlib.Path(f"{name}.csv.gz")
+    if npy.exists() and (not csv.exists() or npy.stat().st_mtime >= csv.stat().st_mtime):
+        return np.load(npy, mmap_mode="r")
+    return np.genfromtxt(csv, delimiter=",", names=True)
@@ -0,0 +1,168 @@
+"""One organisation, placed in the distributions the posts compute.
+
+The posts describe 501(c)(3)s in aggregate and tell a reader to "read its own
+Form 990" for any one of them. This is the other direction: give an EIN, get
+its figures and where they fall among its peers.
+
+  honest     honest months of operating reserve (reserve.py); analysed
+             population in_pop, as months-of-cash-at-scale and below-zero
+  cs         contributions as % of revenue; POP_MIX, as who-pays
+  pct        public support %, pubsupplesspct170 / totsupp170; the
+             nonpfrea == 7 filers public-support-cliff studies
+
+Each comes with its percentile (% of the organisation's size-band peers at or
+below it) within one of below-zero's four expense bands. An organisation
+outside a metric's population gets null for it.
+
+  python3 -m soilib.lookup --build ../data/24eoextract990.csv    # once (pandas)
+  python3 -m soilib.lookup 530196605 131624100                   # JSON lines
+  python3 -m soilib.lookup --serve 8990          # GET /ein/530196605 -> JSON
+
+(from calcs/). build() writes ../data/cache/lookup/, one .npy per column,
+every column in ascending-EIN order, so an organisation's row is
+np.searchsorted on the memory-mapped EIN array; and per metric, each band's
+values sorted and concatenated (<metric>.sorted, with band offsets
+<metric>.start), so a percentile is one more searchsorted in that band's
+slice. A lookup touches a few pages of each file and answers in tens of
+microseconds.
+
+Answering needs only numpy and the standard library — no pandas, so it runs
+in the matplotlib env, and starts in a fraction of a second. Building is the
+one step that reads the extract, and imports pandas to do it.
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from soilib import store
+from soilib.groups import band_codes
+
+INDEX = pathlib.Path(__file__).resolve().parent.parent / "data" / "cache" / "lookup"
+EDGES = [0, 5e5, 5e6, 5e7, np.inf]
+BANDS = ["<$500K", "$500K-5M", "$5M-50M", ">$50M"]
+METRICS = ["honest", "cs", "pct"]
+
+
+def build(src, path=INDEX):
+    """Build the index for the extract at `src` (pandas; once per extract)."""
+    from soilib import extract, reserve, session
+
+    path = pathlib.Path(path)
+    stamp = {"extract": extract.file_hash(src), "code": store.code_key(__file__)}
+    if (path / "meta.json").exists() and json.loads((path / "meta.json").read_text()) == stamp:
+        return path
+
+    df = session.latest(src, ["EIN", "tax_pd", "subseccd", "totfuncexpns",
+                              "totrevenue", "totcntrbgfts", "nonpfrea",
+                              "pubsupplesspct170", "totsupp170"])
+    res = reserve.load(src)              # the same deduped rows, in the same order
+    ein = df.EIN.to_numpy(dtype=np.int64)
+    assert np.array_equal(res.EIN.to_numpy(dtype=np.int64), ein)
+
+    c3 = (df.subseccd == 3).to_numpy()
+    honest = np.where(res.in_pop.to_numpy() & c3, res.honest.to_numpy(), np.nan)
+    rev = df.totrevenue.to_numpy(dtype=float)
+    sup = df.totsupp170.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cs = np.nan_to_num(df.totcntrbgfts.to_numpy(dtype=float)) / rev * 100
+        pct = df.pubsupplesspct170.to_numpy(dtype=float) / sup * 100
+    cs[~(c3 & (rev > 0) & (cs >= 0) & (cs <= 100))] = np.nan
+    pct[~(c3 & (sup > 0) & (df.nonpfrea == 7).to_numpy() & (pct >= 0) & (pct <= 100))] = np.nan
+
+    order = np.argsort(ein, kind="stable")
+    cols = {"ein": ein[order],
+            "tax_pd": df.tax_pd.to_numpy(dtype=np.int64)[order],
+            "band": band_codes(df.totfuncexpns.to_numpy(dtype=float)[order], EDGES).astype(np.int8),
+            "honest": honest[order], "cs": cs[order], "pct": pct[order]}
+    for m in METRICS:
+        ok = ~np.isnan(cols[m]) & (cols["band"] >= 0)
+        b, v = cols["band"][ok], cols[m][ok]
+        srt = np.lexsort((v, b))
+        cols[f"{m}.sorted"] = v[srt]
+        cols[f"{m}.start"] = np.searchsorted(b[srt], np.arange(len(BANDS) + 1))
+
+    store.save_dir(path, cols, {"meta.json": json.dumps(stamp)})
+    print(f"  indexed {len(order):,} EINs from {pathlib.Path(src).name} -> {path}")
+    return path
+
+
+class Index:
+    """The built index, memory-mapped; lookup(ein) answers one EIN."""
+
+    def __init__(self, path=INDEX):
+        path = pathlib.Path(path)
+        if not (path / "meta.json").exists():
+            raise FileNotFoundError(f"no index at {path}; run with --build <extract> first")
+        self.cols = {f.stem: np.load(f, mmap_mode="r") for f in path.glob("*.npy")}
+        self.ein = self.cols["ein"]
+
+    def __len__(self):
+        return len(self.ein)
+
+    def lookup(self, ein):
+        """{"ein", "tax_pd", "band", metric, metric + "_pctile", ...}, or None
+        for an EIN not in the extract. Percentiles are % of the band's peers
+        (in that metric's population) at or below; null outside it."""
+        ein = int(ein)
+        i = int(np.searchsorted(self.ein, ein))
+        if i == len(self.ein) or self.ein[i] != ein:
+            return None
+        band = int(self.cols["band"][i])
+        out = {"ein": ein, "tax_pd": int(self.cols["tax_pd"][i]),
+               "band": BANDS[band] if band >= 0 else None}
+        for m in METRICS:
+            v = float(self.cols[m][i])
+            if np.isnan(v) or band < 0:
+                out[m] = out[f"{m}_pctile"] = None
+                continue
+            lo, hi = self.cols[f"{m}.start"][band:band + 2]
+            peers = self.cols[f"{m}.sorted"][lo:hi]
+            out[m] = v
+            out[f"{m}_pctile"] = 100 * int(np.searchsorted(peers, v, side="right")) / len(peers)
+        return out
+
+
+def serve(index, port):
+    """GET /ein/<EIN> -> the lookup as JSON (404 if unknown), on localhost."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            found = (index.lookup(parts[1]) if len(parts) == 2 and parts[0] == "ein"
+                     and parts[1].isdigit() else None)
+            body = json.dumps(found if found else {"error": "unknown EIN"}).encode()
+            self.send_response(200 if found else 404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"  {len(index):,} EINs; serving http://127.0.0.1:{port}/ein/<EIN>")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("eins", nargs="*", help="EINs to look up (JSON line each)")
+    ap.add_argument("--build", metavar="EXTRACT", help="(re)build the index first")
+    ap.add_argument("--serve", metavar="PORT", type=int, help="answer over HTTP")
+    a = ap.parse_args(argv)
+    if a.build:
+        build(a.build)
+    index = Index()
+    for ein in a.eins:
+        print(json.dumps(index.lookup(ein) or {"ein": ein, "error": "unknown EIN"}))
+    if a.serve:
+        serve(index, a.serve)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Every year's extract in one panel, sorted by (EIN, tax_pd).
+
+Each post reads one extract and keeps one return per EIN: a cross-section. The
+panel keeps every filing from every yearly extract it is given, one row per
+(EIN, tax_pd), with the reserve inputs and metrics of reserve.py, so a question
+across years is a lookup in sorted arrays rather than a merge of whole files:
+
+  p = panel.load(panel.extracts())           # every NNeoextract990 in ../data/
+  p.trajectory(123456789, "honest")          # (tax_pd, honest) for that EIN
+  p.pairs(lag=1)                             # rows of the same EIN, one tax year apart
+  p.transitions("honest", [-np.inf, 0, 3, 6, np.inf], where=p["subseccd"] == 3)
+
+  python3 -m soilib.panel            # from calcs/: do below-zero orgs stay there?
+
+The command prints, for every pair of consecutive tax years in the extracts,
+how 501(c)(3)s in the analysed population (reserve.py's in_pop, both years)
+move between bands of honest months. It is a report, not part of a post:
+what it reads is whatever extracts are in ../data/, and it ingests each one
+the first time.
+
+HOW IT IS STORED
+----------------
+Columns are .npy files in ../data/cache/, opened memory-mapped, all in the
+same row order: ascending EIN, then tax_pd. EIN boundaries are precomputed
+(`eins` and `start`, one entry per EIN), so one organisation's rows are a
+binary search and a slice.
+
+  partitions   one directory per extract, keyed by the extract's hash and the
+               source of this module and what it imports: a new year
+               ingests only that year
+  panel        the partitions merged: one lexsort of the keys, then each
+               column gathered in turn, so a column is in memory at a time, not
+               the panel
+
+A filing present in more than one extract (a late or amended return) keeps the
+row from the latest extract; within one extract a repeated (EIN, tax_pd) keeps
+the last row in the file, as latest_per_ein does.
+
+JOINS ARE SORTED MERGES
+-----------------------
+Tax year is tax_pd // 100. pairs() reduces the panel to the latest filing per
+(EIN, tax year), whose key ein * 10_000 + year is already in ascending order,
+and finds each key + lag in that same sorted array with np.searchsorted: a
+merge of two sorted sequences, no hash join, no copy of the frame.
+transitions() bins both sides of the pairs with groups.band_codes and counts
+every (from, to) band at once with one np.bincount.
+
+Columns an older extract does not have are NaN for its rows.
+"""
+
+import argparse
+import hashlib
+import pathlib
+import sys
+
+import numpy as np
+
+from soilib import extract, reserve, store
+from soilib.groups import band_codes
+
+COLUMNS = ["subseccd", *reserve.INPUTS, "fasb", "cashexp", "in_pop", *reserve.METRICS]
+
+
+def extracts(data=extract.DATA):
+    """Every NNeoextract990.csv / .zip in `data`, oldest first."""
+    return sorted(pathlib.Path(data).glob("[0-9][0-9]eoextract990.*"))
+
+
+def _year(src):
+    return 2000 + int(pathlib.Path(src).name[:2])
+
+
+def partition(src):
+    """The partition of the extract at `src`, ingested on first use: every
+    filing, with ein, tax_pd, year and COLUMNS, in file order. Returns its directory."""
+    path = extract.cache_path(src)
+    path = path.with_name(f"{path.stem}-panel-{store.code_key(__file__)}")
+    if path.exists():
+        return path
+    print(f"  ingesting {pathlib.Path(src).name} -> {path.name} (one time)")
+    actual = {c.lower(): c for c in extract.columns(src)}
+    want = ["ein", "tax_pd", "subseccd", *reserve.INPUTS]
+    have = [actual[c] for c in want if c in actual]
+    missing = [c for c in want if c not in actual]
+    if missing:
+        print(f"    ({pathlib.Path(src).name} has no {', '.join(missing)}; NaN there)")
+    df = extract.read_extract(src, have)
+    df.columns = [c.lower() for c in df.columns]
+    for c in missing:
+        df[c] = np.nan
+    df = df.join(reserve.metrics(df))
+    arrays = {"ein": df.ein.to_numpy(dtype=np.int64),
+              "tax_pd": df.tax_pd.to_numpy(dtype=float),
+              "year": np.full(len(df), _year(src), dtype=np.int16),
+              "subseccd": df.subseccd.to_numpy(dtype=float)}
+    for c in COLUMNS[1:]:
+        arrays[c] = df[c].to_numpy(dtype=bool if c in ("fasb", "in_pop") else float)
+    store.save_dir(path, arrays)
+    return path
+
+
+def build(sources):
+    """Merge the partitions of `sources` into one panel. Returns its directory."""
+    parts = [partition(src) for src in sources]
+    key = hashlib.sha256("\0".join(p.name for p in parts).encode()).hexdigest()[:16]
+    path = extract.CACHE / f"panel-{key}"
+    if path.exists():
+        return path
+
+    def column(name):
+        return np.concatenate([np.load(p / f"{name}.npy", mmap_mode="r") for p in parts])
+
+    ein, tax_pd, year = column("ein"), column("tax_pd"), column("year")
+    order = np.lexsort((np.arange(len(ein)), year, tax_pd, ein))
+    e, t = ein[order], np.nan_to_num(tax_pd[order], nan=-1)
+    order = order[np.r_[(e[1:] != e[:-1]) | (t[1:] != t[:-1]), True]]
+    out = {"ein": ein[order], "tax_pd": tax_pd[order], "year": year[order]}
+    del ein, tax_pd, year, e, t
+    for name in COLUMNS:
+        out[name] = column(name)[order]
+    eins, start = np.unique(out["ein"], return_index=True)
+    out["eins"], out["start"] = eins, np.r_[start, len(order)]
+    store.save_dir(path, out)
+    return path
+
+
+class Panel:
+    """A built panel, memory-mapped. p[column] is that column, in panel order."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.eins = np.load(self.path / "eins.npy", mmap_mode="r")
+        self.start = np.load(self.path / "start.npy", mmap_mode="r")
+        self._cols = {}
+
+    def __getitem__(self, name):
+        if name not in self._cols:
+            self._cols[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._cols[name]
+
+    def __len__(self):
+        return int(self.start[-1])
+
+    def rows(self, ein):
+        """The slice of panel rows belonging to `ein` (empty if it never filed)."""
+        i = np.searchsorted(self.eins, ein)
+        if i == len(self.eins) or self.eins[i] != ein:
+            return slice(0, 0)
+        return slice(int(self.start[i]), int(self.start[i + 1]))
+
+    def trajectory(self, ein, column):
+        """(tax_pd, column) for every filing of `ein`, oldest first."""
+        r = self.rows(ein)
+        return np.asarray(self["tax_pd"][r]), np.asarray(self[column][r])
+
+    def pairs(self, lag=1):
+        """(i, j): row i is an EIN's latest filing for some tax year, row j its
+        latest for the tax year `lag` later. Both in panel order."""
+        ty = self["tax_pd"] // 100
+        key = np.asarray(self["ein"]) * 10_000 + np.nan_to_num(ty, nan=-1).astype(np.int64)
+        last = np.flatnonzero(np.r_[key[1:] != key[:-1], True])
+        last = last[~np.isnan(ty[last])]
+        k = key[last]
+        pos = np.searchsorted(k, k + lag)
+        hit = pos < len(k)
+        hit[hit] = k[pos[hit]] == k[hit] + lag
+        return last[hit], last[pos[hit]]
+
+    def transitions(self, column, edges, lag=1, where=None):
+        """Counts[a, b] of EINs in band a of `column` in one tax year and band
+        b `lag` years later. Bands are left-closed [edges[i], edges[i+1]), as
+        groups.band_codes; `where` (a mask over panel rows) must hold at both
+        ends."""
+        i, j = self.pairs(lag)
+        if where is not None:
+            where = np.asarray(where)
+            keep = where[i] & where[j]
+            i, j = i[keep], j[keep]
+        a, b = band_codes(self[column][i], edges), band_codes(self[column][j], edges)
+        ok = (a >= 0) & (b >= 0)
+        k = len(edges) - 1
+        return np.bincount(a[ok] * k + b[ok], minlength=k * k).reshape(k, k)
+
+
+def load(sources=None):
+    """The panel over `sources` (default: every extract in ../data/), built on
+    first use."""
+    return Panel(build(extracts() if sources is None else sources))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("extracts", nargs="*", help="default: every NNeoextract990 in ../data/")
+    a = ap.parse_args(argv)
+    sources = [pathlib.Path(s) for s in a.extracts] or extracts()
+    if len(sources) < 2:
+        raise SystemExit(f"need two or more extracts, have {len(sources)}")
+    p = load(sources)
+    # Both years: 501(c)(3), in the analysed population. honest <= 0 is the
+    # band [-inf, smallest positive float).
+    c3 = (p["subseccd"] == 3) & p["in_pop"]
+    edges = [-np.inf, np.nextafter(0, 1), 3, 6, np.inf]
+    names = ["<= 0", "0-3 mo", "3-6 mo", "6+ mo"]
+    moves = p.transitions("honest", edges, where=c3)
+    print(f"year over year, {moves.sum():,} EIN-years across {len(sources)} extracts"
+          " (row: this year; columns: next):")
+    print("  " + " " * 8 + "".join(f"{n:>9}" for n in names))
+    for name, row in zip(names, moves):
+        print(f"  {name:>8}" + "".join(f"{100 * v / max(row.sum(), 1):8.1f}%" for v in row))
+    print(f"below zero one year, still below zero the next: "
+          f"{100 * moves[0, 0] / max(moves[0].sum(), 1):.1f}%")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
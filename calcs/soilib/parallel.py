@@ -0,0 +1,70 @@
+"""Deterministic process-pool map for the resampling loops.
+
+A resampling run is split into a FIXED number of tasks (batches of draws).
+Task i gets the i-th child of SeedSequence(seed).spawn(n_tasks) and results
+come back in task order, so the worker count only decides which process runs
+which task: BOOT_SEED = 7 gives bit-identical draws on one core or sixteen.
+workers=1 runs the tasks in-process with no pool at all.
+
+Large inputs reach the workers through multiprocessing.shared_memory: copied
+once into a named block, attached read-only by each worker's initializer,
+never pickled per task.
+
+Workers are forked. The posts' compute.py files are top-level scripts, and a
+spawned worker would re-import (re-run) the script that started it. Where fork
+is unavailable (Windows) run_tasks falls back to in-process, which gives the
+same results, slower. Task functions must therefore live in an importable
+module (bunching.py, soilib), not in the script itself:
+
+    out = run_tasks(bunching.boot_task, 20, BOOT_SEED, {"p": p}, args=(SPEC, 1000))
+
+numpy only.
+"""
+
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_ARRAYS = {}
+
+
+def _attach(specs):
+    for name, (block, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=block)
+        a = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        a.flags.writeable = False
+        _ARRAYS[name] = (shm, a)              # keep the block open for the view
+
+
+def _call(job):
+    fn, seed, args = job
+    return fn(np.random.default_rng(seed), {k: a for k, (_, a) in _ARRAYS.items()}, *args)
+
+
+def run_tasks(fn, n_tasks, seed, arrays=None, args=(), workers=None):
+    """[fn(rng_i, arrays, *args) for i in range(n_tasks)], in task order.
+
+    rng_i is a Generator on the i-th spawned child of SeedSequence(seed);
+    `arrays` is a dict of ndarrays, shared with the workers (read-only).
+    workers=None uses every core; the result never depends on it."""
+    seeds = np.random.SeedSequence(seed).spawn(n_tasks)
+    arrays = arrays or {}
+    workers = min(workers or os.cpu_count() or 1, n_tasks)
+    if workers <= 1 or "fork" not in mp.get_all_start_methods():
+        return [fn(np.random.default_rng(s), arrays, *args) for s in seeds]
+    blocks, specs = [], {}
+    try:
+        for name, a in arrays.items():
+            a = np.ascontiguousarray(a)
+            shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+            blocks.append(shm)
+            np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+            specs[name] = (shm.name, a.shape, a.dtype.str)
+        with mp.get_context("fork").Pool(workers, _attach, (specs,)) as pool:
+            return pool.map(_call, [(fn, s, args) for s in seeds], chunksize=1)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Rebuild the calcs/ outputs whose inputs changed, and nothing else.
+
+Each post is two stages: compute.py reads the data files and writes its
+intermediates; figures.py reads those and writes the post's PNGs in images/.
+STAGES below declares every stage's inputs (paths or glob patterns) and
+outputs. A stage's code is its script plus every module it imports from its
+own directory or from soilib, followed through their imports in turn.
+
+A stage's key is a SHA-256 over its code and the contents of its inputs — the
+TikZ cache (lib/Blog/TikZ.hs) keys a diagram the same way. A stage runs only
+if its key differs from the one recorded at its last successful run, or if one
+of its outputs is missing or no longer what that run wrote. So:
+
+  edit a figures.py            that figures stage reruns; nothing else
+  edit a compute.py            it reruns; its figures rerun only if the
+                               intermediates come out different
+  edit soilib/reserve.py       the three posts that use it rerun
+  a re-downloaded extract      everything built on it reruns
+
+Stages whose prerequisites are done run concurrently (-j), so independent
+posts build side by side. Each is a subprocess run from its own directory,
+exactly as by hand; its output goes to data/cache/pipeline/<stage>.log and is
+shown when it fails. A failed stage (including a compute.py whose checks fail)
+stops only the stages downstream of it.
+
+compute stages run under --python and figures stages under --figures-python
+(both default to this interpreter), for the usual split of a pandas env and a
+matplotlib env:
+
+  python3 soilib/pipeline.py --figures-python .../envs/qchem/bin/python
+  python3 soilib/pipeline.py -n                   # what would run
+  python3 soilib/pipeline.py who-pays/figures     # one stage (+ what it needs)
+  python3 soilib/pipeline.py --force who-pays     # both who-pays stages
+
+The four posts on the 2024 extract all start by converting it and building the
+reserve table; the "extract" stage does that once, before them, rather than
+four processes racing to do it on a first run.
+
+State (stage keys, output hashes, and a (size, mtime) memo of file hashes so
+an unchanged 250MB extract is not re-read every run) is kept in
+data/cache/pipeline.json. uvvis-pushpull is not here: its compute leg is a set
+of quantum-chemistry jobs, run by its own run_all.sh. Standard library only.
+"""
+
+import argparse
+import ast
+import concurrent.futures as cf
+import hashlib
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+CALCS = pathlib.Path(__file__).resolve().parent.parent
+STATE = CALCS / "data" / "cache" / "pipeline.json"
+LOGS = STATE.parent / "pipeline"
+
+EXTRACT_24 = "data/24eoextract990.csv"
+
+
+def _stage(name, script, inputs=(), outputs=(), after=(), python="compute",
+           cmd=None, cwd=None):
+    """A stage: `script` (relative to calcs/) run from its own directory, or
+    `cmd` run from `cwd`. inputs and outputs are relative to calcs/
+    ("../images/..." for the PNGs)."""
+    return {"name": name, "script": script, "inputs": list(inputs),
+            "outputs": list(outputs), "after": list(after), "python": python,
+            "cmd": cmd or [pathlib.Path(script).name],
+            "cwd": cwd or str(pathlib.Path(script).parent)}
+
+
+def _post(post, inputs, intermediates, images, after=()):
+    """The compute and figures stages of one post."""
+    mid = [f"{post}/{f}" for f in intermediates]
+    return [
+        _stage(f"{post}/compute", f"{post}/compute.py", inputs, mid, after),
+        _stage(f"{post}/figures", f"{post}/figures.py", mid,
+               [f"../images/{f}" for f in images], [f"{post}/compute"], "figures"),
+    ]
+
+
+def _npy(*names):
+    return [f"{n}{ext}" for n in names for ext in (".csv.gz", ".npy")]
+
+
+STAGES = [
+    _stage("extract", "soilib/reserve.py", [EXTRACT_24],
+           cmd=["-m", "soilib.reserve", EXTRACT_24], cwd="."),
+    _stage("lookup", "soilib/lookup.py", [EXTRACT_24], ["data/cache/lookup/meta.json"],
+           ["extract"], cmd=["-m", "soilib.lookup", "--build", EXTRACT_24], cwd="."),
+    _stage("cube", "soilib/cube.py", [EXTRACT_24], ["data/cache/cube/meta.json"],
+           ["extract"], cmd=["-m", "soilib.cube", "--build", EXTRACT_24], cwd="."),
+    *_post("months-of-cash-at-scale", [EXTRACT_24], _npy("c3_months"),
+           [f"2026-07-07-months-of-cash-at-scale-{f}.png"
+            for f in ("distribution", "bands")], ["extract"]),
+    *_post("below-zero", [EXTRACT_24], _npy("neg_c3", "all_c3"),
+           [f"2026-07-11-below-zero-{f}.png"
+            for f in ("hero", "by-size", "liquidity")], ["extract"]),
+    *_post("who-pays", [EXTRACT_24], _npy("mix") + ["agg.json"],
+           [f"2026-07-14-nobodys-average-{f}.png"
+            for f in ("hero", "bimodal", "by-size", "inverted-u")], ["extract"]),
+    *_post("public-support-cliff", [EXTRACT_24],
+           _npy("cf", "cliff") + ["stats.json"],
+           [f"2026-07-15-public-support-cliff-{f}.png"
+            for f in ("hero", "distribution", "placebo", "concentration")],
+           ["extract"]),
+    *_post("soi-reconciliation", ["data/22eo01.xlsx", "data/23eoextract990.zip"],
+           ["reconciliation.json"],
+           [f"2026-07-21-checking-our-work-{f}.png" for f in ("hero", "contrib")]),
+    *_post("two-fifths-government", ["data/22eo01.xlsx", "data/22eo03.xlsx"],
+           ["results.json"],
+           [f"2026-07-22-two-fifths-government-{f}.png" for f in ("hero", "mix")]),
+]
+
+
+# -- hashing -------------------------------------------------------------------
+
+class Hasher:
+    """SHA-256 of file contents, memoised across runs on (size, mtime_ns)."""
+
+    def __init__(self, memo):
+        self.memo = memo
+
+    def __call__(self, path):
+        path = pathlib.Path(path)
+        st = path.stat()
+        rel = os.path.relpath(path, CALCS)
+        hit = self.memo.get(rel)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            while block := f.read(1 << 20):
+                h.update(block)
+        self.memo[rel] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+
+def code_files(script):
+    """`script` and the local modules it imports, transitively: siblings in its
+    own directory (bunching.py) and soilib modules. Sorted paths."""
+    seen, todo = set(), [pathlib.Path(script).resolve()]
+    while todo:
+        path = todo.pop()
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        for node in ast.walk(ast.parse(path.read_bytes())):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module] + [f"{node.module}.{a.name}" for a in node.names]
+            else:
+                continue
+            for name in names:
+                parts = name.split(".")
+                if parts[0] == "soilib":
+                    todo.append(CALCS.joinpath(*parts).with_suffix(".py"))
+                elif len(parts) == 1:
+                    todo.append(path.parent / f"{name}.py")
+    return sorted(seen)
+
+
+def stage_key(stage, hasher):
+    """SHA-256 over the stage's command, code and inputs (names and contents)."""
+    h = hashlib.sha256(json.dumps([stage["cwd"], stage["cmd"]]).encode())
+    for path in code_files(CALCS / stage["script"]):
+        h.update(f"{os.path.relpath(path, CALCS)}\0{hasher(path)}\0".encode())
+    for rel in stage["inputs"]:
+        for path in sorted(CALCS.glob(rel)):
+            h.update(f"{os.path.relpath(path, CALCS)}\0{hasher(path)}\0".encode())
+    return h.hexdigest()
+
+
+# -- running -------------------------------------------------------------------
+
+def run(stage, python):
+    """Run one stage; (ok, seconds). Output goes to its log file."""
+    log = LOGS / f"{stage['name'].replace('/', '.')}.log"
+    log.parent.mkdir(parents=True, exist_ok=True)
+    t = time.perf_counter()
+    with open(log, "w") as f:
+        code = subprocess.call([python, *stage["cmd"]], cwd=CALCS / stage["cwd"],
+                               stdout=f, stderr=subprocess.STDOUT,
+                               env={**os.environ, "PYTHONUNBUFFERED": "1"})
+    if code:
+        tail = log.read_text(errors="replace").splitlines()[-20:]
+        print(f"  -- {stage['name']} exited {code}; last lines of {log.name}:")
+        print("\n".join(f"     {line}" for line in tail))
+    return code == 0, time.perf_counter() - t
+
+
+def save(state):
+    STATE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=1, sort_keys=True))
+    tmp.replace(STATE)
+
+
+def select(targets):
+    """The named stages ("post" means both of its stages) and everything they
+    need, in STAGES order."""
+    by_name = {s["name"]: s for s in STAGES}
+    if not targets:
+        return list(STAGES)
+    want = set()
+    for t in targets:
+        hits = [n for n in by_name if n == t or n.split("/")[0] == t.rstrip("/")]
+        if not hits:
+            raise SystemExit(f"unknown stage {t!r}; choose from {sorted(by_name)}")
+        want.update(hits)
+    todo = list(want)
+    while todo:
+        for dep in by_name[todo.pop()]["after"]:
+            if dep not in want:
+                want.add(dep)
+                todo.append(dep)
+    return [s for s in STAGES if s["name"] in want]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("targets", nargs="*", help="stages or posts (default: all)")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("-n", "--dry-run", action="store_true",
+                    help="report what is stale; run nothing")
+    ap.add_argument("--force", action="store_true",
+                    help="run the selected stages even if up to date")
+    ap.add_argument("--python", default=sys.executable,
+                    help="interpreter for compute stages (pandas env)")
+    ap.add_argument("--figures-python", default=None,
+                    help="interpreter for figures stages (matplotlib env)")
+    a = ap.parse_args(argv)
+    python = {"compute": a.python, "figures": a.figures_python or a.python}
+
+    state = json.loads(STATE.read_text()) if STATE.exists() else {}
+    records = state.setdefault("stages", {})
+    hasher = Hasher(state.setdefault("files", {}))
+    stages = select(a.targets)
+    names = {s["name"] for s in stages}
+    status = {}          # name -> "ran", "fresh", "would run", "FAIL", "skipped"
+
+    def stale(stage):
+        """(key, reason): reason is None when the stage is up to date, key is
+        None when it cannot run."""
+        missing = [r for r in stage["inputs"] if not any(CALCS.glob(r))]
+        if missing:
+            return None, f"missing input {missing[0]}"
+        key = stage_key(stage, hasher)
+        rec = records.get(stage["name"])
+        if a.force:
+            return key, "forced"
+        if rec is None:
+            return key, "never run"
+        if rec["key"] != key:
+            return key, "code or inputs changed"
+        for rel, digest in rec["outputs"].items():
+            if not (CALCS / rel).exists() or hasher(CALCS / rel) != digest:
+                return key, f"{rel} missing or changed"
+        return key, None
+
+    def start(stage):
+        """Decide a stage whose prerequisites are done; a future if it runs."""
+        name = stage["name"]
+        deps = [d for d in stage["after"] if d in names]
+        if any(status[d] in ("FAIL", "skipped") for d in deps):
+            status[name] = "skipped"
+            print(f"  skip {name} (after {', '.join(deps)})")
+        elif a.dry_run and any(status[d] == "would run" for d in deps):
+            status[name] = "would run"
+            print(f"  would run {name} (after {', '.join(deps)})")
+        else:
+            key, why = stale(stage)
+            if key is None:
+                status[name] = "FAIL"
+                print(f"  FAIL {name}: {why}")
+            elif why is None:
+                status[name] = "fresh"
+            elif a.dry_run:
+                status[name] = "would run"
+                print(f"  would run {name} ({why})")
+            else:
+                print(f"  run  {name} ({why})")
+                return key, pool.submit(run, stage, python[stage["python"]])
+        return None
+
+    t0 = time.perf_counter()
+    with cf.ThreadPoolExecutor(max(a.jobs, 1)) as pool:
+        running = {}                                  # future -> (stage, key)
+        while len(status) < len(stages):
+            for stage in stages:
+                if (stage["name"] in status
+                        or any(s is stage for s, _ in running.values())
+                        or any(d in names and d not in status for d in stage["after"])):
+                    continue
+                started = start(stage)
+                if started:
+                    running[started[1]] = (stage, started[0])
+            if not running:
+                continue
+            finished, _ = cf.wait(running, return_when=cf.FIRST_COMPLETED)
+            for fut in finished:
+                stage, key = running.pop(fut)
+                ok, secs = fut.result()
+                missing = [r for r in stage["outputs"] if not (CALCS / r).exists()]
+                if ok and missing:
+                    print(f"  -- {stage['name']} did not write {missing[0]}")
+                    ok = False
+                if ok:
+                    records[stage["name"]] = {
+                        "key": key,
+                        "outputs": {r: hasher(CALCS / r) for r in stage["outputs"]}}
+                    save(state)
+                status[stage["name"]] = "ran" if ok else "FAIL"
+                print(f"  {'done' if ok else 'FAIL'} {stage['name']} ({secs:.1f}s)")
+
+    if not a.dry_run:
+        save(state)                                   # the file-hash memo
+    count = {k: sum(v == k for v in status.values())
+             for k in ("ran", "would run", "fresh", "FAIL", "skipped")}
+    print(f"\n{count['ran'] + count['would run']} {'would run' if a.dry_run else 'ran'}, "
+          f"{count['fresh']} up to date, {count['FAIL']} failed, "
+          f"{count['skipped']} skipped ({time.perf_counter() - t0:.1f}s)")
+    return 1 if count["FAIL"] or count["skipped"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Regenerate every post built on the 2024 SOI extract, in one process.
+
+Run separately, the four compute.py scripts each read and dedup
+24eoextract990.csv and each build the reserve table. Run from here they share
+one process, so session.py and reserve.load hand every script the same
+in-memory extract columns, dedup and FASB-filtered reserve table; the I/O and
+dedup are paid once.
+
+Each script still runs as itself — top to bottom, from its own directory, with
+its own check() assertions — and writes the same files it writes on its own.
+A script that fails its checks (or raises) is reported and the rest still run.
+
+Run from calcs/:
+  python3 soilib/refresh.py                   # all four
+  python3 soilib/refresh.py who-pays below-zero
+"""
+
+import os
+import pathlib
+import runpy
+import sys
+import time
+import traceback
+
+CALCS = pathlib.Path(__file__).resolve().parent.parent
+POSTS = ["months-of-cash-at-scale", "below-zero", "who-pays", "public-support-cliff"]
+
+
+def run(post):
+    """Run calcs/<post>/compute.py in this process. True if its checks pass."""
+    here = CALCS / post
+    cwd = os.getcwd()
+    os.chdir(here)
+    sys.path.insert(0, str(here))        # what `python3 compute.py` puts first
+    try:
+        runpy.run_path(str(here / "compute.py"), run_name="__main__")
+        return True
+    except SystemExit as e:
+        return e.code in (None, 0)
+    except Exception:
+        traceback.print_exc()
+        return False
+    finally:
+        sys.path.remove(str(here))
+        os.chdir(cwd)
+
+
+def main(posts):
+    sys.path.insert(0, str(CALCS))
+    status = {}
+    for post in posts:
+        print(f"\n{'=' * 20} {post} {'=' * (56 - len(post))}")
+        t = time.perf_counter()
+        status[post] = run(post)
+        print(f"\n({post}: {time.perf_counter() - t:.1f}s)")
+    print()
+    for post, ok in status.items():
+        print(f"  {'ok  ' if ok else 'FAIL'} {post}")
+    return 0 if all(status.values()) else 1
+
+
+if __name__ == "__main__":
+    unknown = set(sys.argv[1:]) - set(POSTS)
+    if unknown:
+        raise SystemExit(f"unknown post(s): {sorted(unknown)}; choose from {POSTS}")
+    raise SystemExit(main(sys.argv[1:] or POSTS))
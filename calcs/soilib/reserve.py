@@ -0,0 +1,128 @@
+"""Months of operating reserve — every variant, computed once, in one place.
+
+months-of-cash-at-scale, below-zero and who-pays (POP_RESERVE) each carried
+their own copy of the FASB mask and of these formulas. They live here now, so
+the posts cannot drift apart:
+
+  fasb        |line27 + line28 + line29 - line33| <= $1K (Part X). Filers not
+              following ASC 958 report net assets on lines 30-32 and leave
+              27-29 blank, which would fake a zero/negative unrestricted figure.
+  cashexp     totfuncexpns - deprcatndepletn      (cash expenses, Pt IX 25-22)
+  in_pop      fasb & cashexp > 0                  (a runway is defined)
+
+  honest      = (line27 - line10c + line23) / (cashexp / 12)        NORI-style
+  honest_bond =  honest with line20 (tax-exempt bonds) added back
+  naive       = line33 / (totfuncexpns / 12)
+  cashmonths  = (line1 + line2) / (cashexp / 12)   # literal cash on hand
+
+The four ratios are defined only on in_pop rows and are NaN elsewhere. The
+arithmetic is the same IEEE operations in the same order as the per-post
+copies it replaces, so every asserted figure is unchanged; it just runs once,
+on the in_pop rows only, with cashexp / 12 and the line27 - line10c + line23
+numerator each computed a single time.
+
+load(src) returns the deduped extract's reserve table, one row per EIN, and
+persists it next to the extract cache keyed by the extract's hash AND by the
+source of this module and everything it imports (store.code_key), so editing a
+formula invalidates it. Within
+one process (refresh.py) the table is built or read once and handed out as
+copies.
+
+  python3 -m soilib.reserve ../data/24eoextract990.csv   # from calcs/
+
+builds the extract cache and the table ahead of the scripts (pipeline.py's
+"extract" stage).
+"""
+
+import os
+import pathlib
+import sys
+
+import numpy as np
+import pandas as pd
+
+from soilib import extract, session, store
+
+FASB_TOL = 1000
+
+INPUTS = ["totfuncexpns", "deprcatndepletn", "unrstrctnetasstsend",
+          "temprstrctnetasstsend", "permrstrctnetasstsend", "lndbldgsequipend",
+          "secrdmrtgsend", "txexmptbndsend", "totnetassetend", "nonintcashend",
+          "svngstempinvend"]
+METRICS = ["honest", "honest_bond", "naive", "cashmonths"]
+
+_LOADED = {}    # (extract, ein) -> reserve table, for this process
+
+
+def fasb_mask(df, tol=FASB_TOL):
+    """Part X lines 27+28+29 reconcile to line 33 within `tol` dollars."""
+    return ((df.unrstrctnetasstsend + df.temprstrctnetasstsend
+             + df.permrstrctnetasstsend - df.totnetassetend).abs() <= tol)
+
+
+def metrics(df, tol=FASB_TOL):
+    """fasb, cashexp, in_pop and the four reserve ratios for each row of `df`.
+
+    Returns a DataFrame on df's index. Full-length arrays are allocated only
+    for the outputs; the ratios are computed on the in_pop rows and scattered
+    back, so nothing is divided by a non-positive runway.
+    """
+    def col(c, rows=slice(None)):
+        return df[c].to_numpy(dtype=float)[rows]
+
+    fasb = fasb_mask(df, tol).to_numpy()
+    cashexp = col("totfuncexpns") - col("deprcatndepletn")
+    pop = fasb & (cashexp > 0)
+    idx = np.flatnonzero(pop)
+
+    monthly = cashexp[idx] / 12.0
+    num = col("unrstrctnetasstsend", idx) - col("lndbldgsequipend", idx)
+    num += col("secrdmrtgsend", idx)
+    out = {}
+    out["honest"] = num / monthly
+    num += col("txexmptbndsend", idx)
+    out["honest_bond"] = np.divide(num, monthly, out=num)
+    out["naive"] = col("totnetassetend", idx) / (col("totfuncexpns", idx) / 12.0)
+    cash = col("nonintcashend", idx) + col("svngstempinvend", idx)
+    out["cashmonths"] = np.divide(cash, monthly, out=cash)
+
+    res = pd.DataFrame({"fasb": fasb, "cashexp": cashexp, "in_pop": pop},
+                       index=df.index)
+    for name in METRICS:
+        full = np.full(len(df), np.nan)
+        full[idx] = out[name]
+        res[name] = full
+    return res
+
+
+def table_path(src):
+    base = extract.cache_path(src)
+    return base.with_name(f"{base.stem}-reserve-{store.code_key(__file__)}.parquet")
+
+
+def load(src, ein="EIN"):
+    """The reserve table for the extract at `src`: one row per EIN (latest tax
+    period), with tax_pd, subseccd, the INPUTS columns and metrics(). Built
+    once per extract and reused; select the analysed population with in_pop."""
+    key = (str(pathlib.Path(src).resolve()), ein)
+    if key not in _LOADED:
+        _LOADED[key] = _load(src, ein)
+    return _LOADED[key].copy()
+
+
+def _load(src, ein):
+    path = table_path(src) if extract.pq is not None else None
+    if path is not None and path.exists():
+        return pd.read_parquet(path)
+    df = session.latest(src, [ein, "tax_pd", "subseccd"] + INPUTS, ein=ein)
+    df = df.join(metrics(df)).reset_index(drop=True)
+    if path is not None:
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp, index=False)
+        tmp.replace(path)
+    return df
+
+
+if __name__ == "__main__":
+    for src in sys.argv[1:]:
+        print(f"{src}: {len(load(src)):,} EINs -> {table_path(src).name}")
@@ -0,0 +1,158 @@
+"""Column types for the SOI extract, applied once, when it is parsed.
+
+Left to pandas' inference the extract comes back wide: EIN and tax_pd as
+int64, subseccd as int64, nonpfrea as a column of Python strings (a few rows
+hold text that is not a code, so the scripts each ran pd.to_numeric(...,
+errors="coerce") on it), and every Y/N flag as one Python string per row. The
+types below are fixed at parse time, stored in the Parquet cache, and so are
+what every script reads:
+
+  ein       int32 — nine digits always fit
+  period    int32 — YYYYMM
+  code      categorical of integer codes (subseccd, nonpfrea); text that is
+            not a number becomes NaN, exactly what the coercions did
+  flag      bool, True where the cell is "Y"; "N" and blank are both False,
+            which is what every `== "Y"` test in the scripts meant
+
+Columns not named here: text columns holding nothing but Y/N become flags,
+other text becomes categorical, and numbers are money — the dollar columns:
+
+  money     read as int64 (exact) when no cell is blank, float64 with NaN for
+            blanks when some are (whole dollars are exact in float64 up to
+            2**53). Stored narrower where that is exact for the whole column:
+            int32 when every value fits, float32 (blanks kept as NaN) when
+            every value is a whole number within 2**24. widen() puts the read
+            types back, so no script ever does arithmetic in 32 bits — a sum
+            of int32 columns can wrap, and a float32 ratio rounds.
+
+Blank cells have no int32: an ein or period column with blanks stays float64
+rather than inventing a value. The cache key includes this file's hash, so
+changing a type re-converts the extract.
+
+Whether a column is money, text or a flag, and whether it has blanks, is a
+property of the whole file. survey() reads it in chunks to find out, so the
+parse itself can be chunked too (extract.convert) rather than held whole.
+"""
+
+import hashlib
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = {
+    "EIN": "ein", "ein": "ein",
+    "tax_pd": "period",
+    "subseccd": "code",
+    "nonpfrea": "code",
+    "operatehosptlcd": "flag",
+    "operateschools170cd": "flag",
+}
+
+KEY = hashlib.sha256(pathlib.Path(__file__).read_bytes()).hexdigest()[:8]
+
+
+def parse_dtypes(columns):
+    """dtype= for pd.read_csv: the text kinds parse straight to categorical, so
+    a column never exists as one Python string per row."""
+    return {c: "category" for c in columns if SCHEMA.get(c) in ("code", "flag")}
+
+
+def survey(chunks):
+    """(parse, store) for a file read as `chunks`, DataFrames parsed with
+    parse_dtypes and pandas' inference for the rest.
+
+    parse is the dtype= that reads every column as one whole-file parse would
+    infer it: text in any chunk makes the column text ("category"), a blank or
+    a fraction in any chunk makes it float64, whole numbers throughout int64.
+    store maps each money column to its narrowest exact type (module docstring).
+    """
+    seen = {}       # column -> [kind, lo, hi, blanks, whole]
+    for df in chunks:
+        for c in df.columns:
+            s = df[c]
+            if pd.api.types.is_bool_dtype(s.dtype):
+                kind = "b"
+            elif pd.api.types.is_integer_dtype(s.dtype):
+                kind = "i"
+            elif pd.api.types.is_float_dtype(s.dtype):
+                kind = "f"
+            else:
+                kind = "t"
+            f = seen.setdefault(c, [kind, np.inf, -np.inf, False, True])
+            if f[0] != kind:
+                f[0] = "f" if {f[0], kind} == {"i", "f"} else "t"
+            if kind in "if":
+                x = s.to_numpy(dtype=float)
+                blank = np.isnan(x)
+                x = x[~blank]
+                f[3] |= bool(blank.any())
+                if len(x):
+                    f[1], f[2] = min(f[1], x.min()), max(f[2], x.max())
+                    f[4] &= bool(np.all(x == np.round(x)))
+    parse, store = {}, {}
+    for c, (kind, lo, hi, blanks, whole) in seen.items():
+        parse[c] = {"t": "category", "b": bool, "i": np.int64, "f": np.float64}[kind]
+        if kind not in "if" or c in SCHEMA:
+            continue
+        if kind == "i" and -2**31 <= lo and hi < 2**31:
+            store[c] = np.int32
+        elif kind == "f" and whole and max(-lo, hi) <= 2**24:
+            store[c] = np.float32
+    return parse, store
+
+
+def widen(df):
+    """df with every money column stored narrow (int32, float32) back in its
+    read type (int64, float64), in place and returned. Exact both ways."""
+    for c in df.columns:
+        if c not in SCHEMA and df[c].dtype in (np.int32, np.float32):
+            df[c] = df[c].astype(np.int64 if df[c].dtype == np.int32 else np.float64)
+    return df
+
+
+def _int32(s):
+    if s.isna().any():
+        return s
+    return s.astype(np.int32)
+
+
+def _code(s):
+    s = s.astype("category")
+    num = pd.to_numeric(pd.Series(s.cat.categories, dtype=object),
+                        errors="coerce").to_numpy(dtype=float)
+    codes = s.cat.codes.to_numpy()
+    x = np.where(codes >= 0, num[codes], np.nan)
+    values = np.unique(x[~np.isnan(x)])
+    if np.all(values == np.round(values)):
+        values = values.astype(np.int64)
+    return pd.Series(pd.Categorical(x, categories=values), index=s.index, name=s.name)
+
+
+def _flag(s):
+    return (s == "Y").astype(bool)
+
+
+def _is_text(s):
+    return s.dtype == "category" or pd.api.types.is_string_dtype(s.dtype)
+
+
+def _is_yn(s):
+    vals = s.cat.categories if s.dtype == "category" else s.dropna().unique()
+    return len(vals) > 0 and set(vals) <= {"Y", "N"}
+
+
+def apply(df):
+    """df with every column converted to its kind, in place and returned."""
+    for c in df.columns:
+        kind = SCHEMA.get(c)
+        s = df[c]
+        if kind in ("ein", "period"):
+            df[c] = _int32(s)
+        elif kind == "code":
+            df[c] = _code(s)
+        elif kind == "flag" or (_is_text(s) and _is_yn(s)):
+            df[c] = _flag(s)
+        elif _is_text(s) and s.dtype != "category":
+            df[c] = s.astype("category")
+    return df
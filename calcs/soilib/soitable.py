@@ -0,0 +1,152 @@
+"""The IRS's published SOI tables, read once and cached as labelled rows.
+
+two-fifths-government and soi-reconciliation check the posts against SOI's
+published EO tables (22eo01.xlsx, 22eo03.xlsx, ...). Both opened the workbook
+with openpyxl's full loader, which builds every cell object and style in
+memory, and then asked for one cell at a time. Here a workbook is streamed
+once, read-only, with iter_rows(values_only=True), and every labelled row of
+every sheet is written to a JSON sidecar in ../data/cache/soi/, keyed by the
+workbook's SHA-256 and this module's source (store.code_key). A rerun reads
+the sidecar — a few ms, and no openpyxl import.
+
+  t = soitable.Table(DATA / "22eo01.xlsx", first=6)   # Sheet1, from row 6
+  t.rows(7)         label -> [column 2 .. column 8]: two-fifths-government
+  t.column(0)       label -> column 2, the Total column: soi-reconciliation
+  t["Total revenue"]                                  every column of that row
+  t.headers         each column's heading: its header rows' text, joined
+
+LAYOUTS
+-------
+The EO tables share one shape — a title, a header of several rows, then one
+row per item with its label in column A and a value per column after it — and
+differ in the rest: the sheet is "Sheet1" in recent years and "Table 1",
+"TBL1", ... in others; the header is three to eight rows deep; some tables run
+over several sheets; sub-items are indented with spaces; a few labels wrap
+onto two lines in one cell; some cells are a footnote marker or "d"
+(suppressed) instead of a number. So:
+
+  - sheet: the one asked for, else "Sheet1", else the first sheet;
+  - first data row: the one asked for, else the first row whose label is text
+    and that has a number after it (header rows hold only text, including the
+    "(1)" column numbers);
+  - a label is the cell's text with its whitespace collapsed, so indentation
+    and line breaks do not matter; rows without a label or without any value
+    are skipped (unlabelled header rows are kept for the headings);
+  - values are kept as the cell holds them: numbers stay int or float, a
+    marker stays a string, a blank is None.
+
+A label that appears more than once (the same item under two headings) maps
+to its last row, as the scripts' dicts did. Values are in the table's units —
+THOUSANDS of dollars for money — and are not converted.
+
+Only .xlsx: openpyxl does not read the older .xls tables. Converting one
+(LibreOffice, `soffice --convert-to xlsx`) is enough.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+
+from soilib import store
+
+CACHE = pathlib.Path(__file__).resolve().parent.parent / "data" / "cache" / "soi"
+
+
+def _file_hash(path):
+    return hashlib.sha256(pathlib.Path(path).read_bytes()).hexdigest()
+
+
+def _label(v):
+    return " ".join(str(v).split()) if v is not None else ""
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _parse(path):
+    """{sheet: [[row number, label, [values...]], ...]} for every row with a
+    value after column A, in every sheet of the workbook ("" = no label)."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        for ws in wb.worksheets:
+            ws.reset_dimensions()      # some tables declare a smaller range than they fill
+            rows = []
+            for r, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                if not row:
+                    continue
+                lab, vals = _label(row[0]), list(row[1:])
+                while vals and vals[-1] is None:
+                    vals.pop()
+                if vals:
+                    rows.append([r, lab, vals])
+            sheets[ws.title] = rows
+        return sheets
+    finally:
+        wb.close()
+
+
+def sidecar(path):
+    """Where the parsed rows of the workbook at `path` are cached."""
+    path = pathlib.Path(path)
+    return CACHE / f"{path.stem}-{_file_hash(path)[:16]}-{store.code_key(__file__)}.json"
+
+
+def sheets(path):
+    """Every sheet's rows (see _parse), from the sidecar if there is one for
+    these bytes, else parsed and cached."""
+    cache = sidecar(path)
+    if cache.exists():
+        return json.loads(cache.read_text())
+    parsed = _parse(path)
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(parsed))
+    tmp.replace(cache)
+    return parsed
+
+
+class Table:
+    """One sheet of a published SOI table: its data rows, by label."""
+
+    def __init__(self, path, sheet=None, first=None):
+        parsed = sheets(path)
+        if sheet is None:
+            sheet = "Sheet1" if "Sheet1" in parsed else next(iter(parsed))
+        rows = parsed[sheet]
+        if first is None:
+            first = next((r for r, lab, vals in rows
+                          if lab and any(map(_is_number, vals))), 0)
+        self.path, self.sheet = pathlib.Path(path), sheet
+        self.data = [(lab, vals) for r, lab, vals in rows if r >= first and lab]
+        head = [vals for r, _, vals in rows if r < first]
+        width = max((len(vals) for _, vals in self.data), default=0)
+        self.headers = [" ".join(_label(h[i]) for h in head
+                                 if i < len(h) and isinstance(h[i], str) and _label(h[i]))
+                        for i in range(width)]
+
+    def rows(self, ncols):
+        """label -> [the first ncols values], None-padded; a row counts if any
+        of those is not blank."""
+        out = {}
+        for lab, vals in self.data:
+            vals = (vals + [None] * ncols)[:ncols]
+            if any(v is not None for v in vals):
+                out[lab] = vals
+        return out
+
+    def column(self, i):
+        """label -> value in column i (0 = the first after the labels), for
+        the rows where it is not blank."""
+        return {lab: vals[i] for lab, vals in self.data
+                if i < len(vals) and vals[i] is not None}
+
+    def __getitem__(self, label):
+        for lab, vals in reversed(self.data):
+            if lab == label:
+                return vals
+        raise KeyError(label)
@@ -0,0 +1,64 @@
+"""Cache keys and atomic writes for the stores under data/cache/.
+
+The reserve table, the panel partitions, the cube, the lookup index, the
+catalog and soitable's sidecars are each derived once and reused, so each must
+be rebuilt when the code that derived it changes, and must never be read half
+written. They used to carry their own copies of both: a hand-listed set of
+source files to hash (which missed modules added later) and a temp-directory
+save. Both live here now:
+
+  code_key(path)               8 hex digits over `path` and every soilib or
+                               sibling module it imports, transitively — the
+                               same closure pipeline.py keys its stages on,
+                               less this module and pipeline.py, so adding a
+                               stage does not rebuild every store
+  save_dir(path, arrays, files)
+                               path/<name>.npy for each array and path/<name>
+                               for each text file, appearing complete or not
+                               at all; replaces what was at `path`
+"""
+
+import functools
+import hashlib
+import os
+import pathlib
+import shutil
+
+import numpy as np
+
+from soilib.pipeline import CALCS, code_files
+
+
+@functools.lru_cache(maxsize=None)
+def code_key(path):
+    """SHA-256 (first 8 hex digits) over the source of `path` (a module's
+    __file__) and of everything pipeline.code_files finds it importing,
+    except the plumbing: this module and pipeline.py."""
+    plumbing = set(code_files(__file__))
+    h = hashlib.sha256()
+    for f in code_files(path):
+        if f in plumbing:
+            continue
+        h.update(f"{os.path.relpath(f, CALCS)}\0".encode())
+        h.update(f.read_bytes())
+    return h.hexdigest()[:8]
+
+
+def save_dir(path, arrays, files=None):
+    """Write `arrays` ({name: array}) as path/<name>.npy and `files` ({name:
+    text}) beside them, in a temp directory renamed into place. A temp
+    directory left by a run that died is cleared first; an older `path` is
+    replaced. Returns `path`."""
+    path = pathlib.Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+    for name, a in arrays.items():
+        np.save(tmp / f"{name}.npy", a)
+    for name, text in (files or {}).items():
+        (tmp / name).write_text(text)
+    if path.exists():
+        shutil.rmtree(path)
+    tmp.rename(path)
+    return path
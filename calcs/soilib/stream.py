@@ -0,0 +1,213 @@
+"""Cut totals of an extract in one streaming pass, never holding the extract.
+
+soi-reconciliation needs only additive figures from an extract — row counts
+and dollar sums for several cuts of the 501(c)(3) rows, and how often EINs
+repeat — yet it read the whole file into a frame to get them. totals() reads
+the CSV (zipped or not) in chunks, keeps running totals, and drops each chunk.
+
+A cut is one of two kinds, and totals() takes any number of each:
+
+  row cut     a test on the chunk -> one flag per row    additive per chunk
+  PerEIN      one row per EIN, its latest (or earliest)  running winners
+              tax period, among a row cut's rows
+
+  pooled      every row with subseccd == code            the default cuts
+  ty<year>    tax_pd in tax year `year`
+  dedup       PerEIN("latest"): latest_per_ein's rows
+  repeats     rows per EIN, and repeated (EIN, tax_pd)    per-EIN counts
+
+Nothing is filtered or copied per cut. Each chunk's line items become one
+(rows x items) int64 matrix V, its row cuts one (rows x cuts) matrix of 0/1
+flags F, and F.T @ V is every row cut's every sum at once: adding a cut adds a
+column to F, not a pass over the data. A PerEIN cut keeps, per EIN, the
+winning row's (tax_pd, position in file) and its line items, and merges each
+chunk's rows into them with one lexsort.
+
+What is held between chunks is one winning row per EIN per PerEIN cut, one
+count per EIN, and each chunk's distinct (EIN, tax_pd) keys — one int64 per
+filing, deduplicated once at the end for `pairs` rather than re-sorted with
+every chunk. So memory is not constant: it grows with the number of EINs and
+filings in the extract (a few MB for a year's), though not with its width or
+with the columns summed, and it is released when totals() returns.
+
+The results are the in-memory ones exactly, not approximately:
+
+  - PerEIN("latest") picks the rows latest_per_ein picks — the largest
+    tax_pd, a tie going to the row LAST in the file, a missing tax_pd after
+    every real one — so the dedup sums are over the same rows; "earliest" is
+    the mirror image, sort_values(kind="stable").drop_duplicates(keep="first");
+  - the sums are kept as Python ints, which is exact; the extract is in whole
+    dollars, so a float column's in-memory sum (every partial sum a whole
+    number below 2**53) is that same integer;
+  - each sum comes back as the type the in-memory sum has: np.int64 for a
+    column pandas parses as integers throughout, np.float64 for one that has
+    a blank anywhere in the file (the whole-file parse makes it float).
+
+Column names are matched case-insensitively (the 2023 extract spells it
+"ein", the 2024 one "EIN") and come back as asked for.
+"""
+
+import numpy as np
+import pandas as pd
+
+from soilib import schema
+
+CHUNK = 250_000
+
+
+def everything(chunk):
+    """Row cut: every row."""
+    return np.ones(len(chunk), dtype=bool)
+
+
+def tax_years(first, last=None, period="tax_pd"):
+    """Row cut: tax_pd in tax years first..last (default: first only)."""
+    last = first if last is None else last
+
+    def test(chunk):
+        ty = chunk[period].to_numpy(dtype=float) // 100
+        return (ty >= first) & (ty <= last)
+    return test
+
+
+class PerEIN:
+    """Cut: one row per EIN, among the rows of row cut `within` — the latest
+    tax period (ties: last in the file) or the earliest (ties: first)."""
+
+    def __init__(self, which="latest", within=everything):
+        if which not in ("latest", "earliest"):
+            raise ValueError(f"which must be 'latest' or 'earliest', not {which!r}")
+        self.which, self.within = which, within
+
+
+class _Winners:
+    """A PerEIN cut's running winners: per EIN, (tax_pd, position) and items."""
+
+    def __init__(self, cut, width):
+        self.last = cut.which == "latest"
+        self.ein = np.empty(0, dtype=np.int64)
+        self.period = np.empty(0)
+        self.pos = np.empty(0, dtype=np.int64)
+        self.values = np.empty((0, width), dtype=np.int64)
+
+    def update(self, ein, period, pos, values):
+        ein = np.concatenate([self.ein, ein])
+        period = np.concatenate([self.period, np.nan_to_num(period, nan=np.inf)])
+        pos = np.concatenate([self.pos, pos])
+        order = np.lexsort((pos, period, ein))
+        e = ein[order]
+        edge = e[1:] != e[:-1]
+        order = order[np.r_[edge, True] if self.last else np.r_[True, edge]]
+        self.ein, self.period, self.pos = ein[order], period[order], pos[order]
+        self.values = np.concatenate([self.values, values])[order]
+
+
+class Totals:
+    """The result of totals(): .cuts[name] is {"n": rows, <name>: sum, ...}
+    for each cut, in the order given; .repeats holds the duplicate-EIN
+    figures (eins, rows, most, pairs — see totals())."""
+
+    def __init__(self, cuts, repeats):
+        self.cuts, self.repeats = cuts, repeats
+
+
+def header(src):
+    """{lower-case name: name as spelled} for every column of the extract."""
+    return {c.lower(): c for c in pd.read_csv(src, nrows=0).columns}
+
+
+def _names(src, wanted):
+    """Actual header spelling of each wanted column, matched ignoring case."""
+    have = header(src)
+    missing = [c for c in wanted if c.lower() not in have]
+    if missing:
+        raise ValueError(f"{getattr(src, 'name', src)} has no column(s) {missing}")
+    return {have[c.lower()]: c for c in wanted}
+
+
+def _dollars(chunk, columns, rows):
+    """The `columns` at `rows` as one int64 matrix (blank = 0); refuses cents."""
+    out = np.empty((len(rows), len(columns)), dtype=np.int64)
+    for j, c in enumerate(columns):
+        v = chunk[c].to_numpy()[rows]
+        if v.dtype.kind == "f":
+            v = np.nan_to_num(v, nan=0.0)
+            if np.any(v != np.round(v)):
+                raise ValueError(f"{c} has fractional dollars; totals() sums whole dollars")
+        out[:, j] = v
+    return out
+
+
+def totals(src, sums, year=None, code=3, ein="ein", period="tax_pd", cuts=None,
+           chunksize=CHUNK):
+    """Row counts and sums of the extract at `src`, for each cut of its
+    subseccd == `code` rows, in one pass of `chunksize`-row chunks.
+
+    `sums` maps result name -> column ({"rev": "totrevenue", ...}); each cut
+    comes back as {"n": ..., "rev": ..., ...} in that order, exactly as
+    {"n": len(frame), "rev": frame.totrevenue.sum(), ...} on the in-memory cut.
+    `cuts` maps cut name -> row cut or PerEIN; the default is pooled,
+    ty<year> and dedup, or pooled and dedup when no `year` is given. Row cuts see the chunk's ein, period, subseccd and
+    summed columns, named as asked for.
+    .repeats over the `code` rows:
+
+      eins    EINs with more than one row       (vc > 1).sum()
+      rows    rows belonging to those EINs      vc[vc > 1].sum()
+      most    the most rows for one EIN         vc.max()
+      pairs   rows repeating an (EIN, tax_pd)   len(c3) - len(c3.drop_duplicates)
+
+    where vc = c3[ein].value_counts().
+    """
+    if cuts is None:
+        cuts = {"pooled": everything}
+        if year is not None:
+            cuts[f"ty{year}"] = tax_years(year, period=period)
+        cuts["dedup"] = PerEIN("latest")
+    items = list(dict.fromkeys(sums.values()))
+    rowcuts = {k: c for k, c in cuts.items() if not isinstance(c, PerEIN)}
+    perein = {k: c for k, c in cuts.items() if isinstance(c, PerEIN)}
+    cols = list(dict.fromkeys([ein, period, "subseccd", *items]))
+    rename = _names(src, cols)
+    winners = {k: _Winners(c, len(items)) for k, c in perein.items()}
+    n = np.zeros(len(rowcuts), dtype=np.int64)
+    total = [[0] * len(items) for _ in rowcuts]
+    counts = pd.Series(dtype=np.int64)
+    filings = [np.empty(0, dtype=np.int64)]     # each chunk's distinct (EIN, tax_pd)
+    floats = set()
+    rows = 0
+    reader = pd.read_csv(src, usecols=list(rename), chunksize=chunksize,
+                         dtype=schema.parse_dtypes(rename))
+    for chunk in reader:
+        chunk = schema.apply(chunk.rename(columns=rename))
+        floats.update(c for c in items if chunk[c].dtype.kind == "f")
+        at = np.flatnonzero((chunk.subseccd == code).to_numpy())
+        V = _dollars(chunk, items, at)
+        F = np.zeros((len(at), len(rowcuts)), dtype=np.int64)
+        for j, test in enumerate(rowcuts.values()):
+            F[:, j] = np.asarray(test(chunk), dtype=bool)[at]
+        n += F.sum(axis=0)
+        for i, s in enumerate(F.T @ V):
+            total[i] = [t + int(v) for t, v in zip(total[i], s)]
+        e = chunk[ein].to_numpy(dtype=np.int64)[at]
+        p = chunk[period].to_numpy(dtype=float)[at]
+        for k, cut in perein.items():
+            keep = np.asarray(cut.within(chunk), dtype=bool)[at]
+            winners[k].update(e[keep], p[keep], rows + np.flatnonzero(keep), V[keep])
+        rows += len(at)
+        counts = pd.concat([counts, pd.Series(e).value_counts()]).groupby(level=0).sum()
+        filings.append(np.unique(e * 1_000_000 + np.nan_to_num(p, nan=-1).astype(np.int64)))
+
+    def result(count, total):
+        """{"n": rows, name: sum, ...} with each sum typed as pandas types it."""
+        out = {"n": int(count)}
+        for name, c in sums.items():
+            v = total[items.index(c)]
+            out[name] = np.float64(v) if c in floats else np.int64(v)
+        return out
+
+    out = {k: result(n[i], total[i]) for i, k in enumerate(rowcuts)}
+    for k, w in winners.items():
+        out[k] = result(len(w.ein), [int(v) for v in w.values.sum(axis=0, dtype=np.int64)])
+    repeats = {"eins": (counts > 1).sum(), "rows": counts[counts > 1].sum(),
+               "most": counts.max(), "pairs": rows - len(np.unique(np.concatenate(filings)))}
+    return Totals({k: out[k] for k in cuts}, repeats)
@@ -0,0 +1,180 @@
+"""below-zero's headline figures over a grid of its definitional choices.
+
+The reserve population and ratios rest on choices fixed in reserve.py and
+below-zero/compute.py: the FASB tolerance (<= $1K), the runway guard
+(cashexp > 0), whether tax-exempt bonds are added back (honest vs
+honest_bond), the expense band edges, and the depth cut-offs (>= -1 "mildly
+under", < -12 "deep"). sweep() recomputes the headline statistics for every
+combination at once, from the reserve table's inputs, instead of one rerun of
+a script per setting:
+
+  t = sweep.sweep(reserve.load(SRC))                 # the default grid below
+  t[(t.stat == "below_zero") & t.band.isna()]        # headline share, every cell
+
+HOW
+---
+A population setting (tol, guard) is one row of a boolean matrix P over the
+501(c)(3) rows: |27 + 28 + 29 - 33| <= tol and cashexp > guard. Every count
+the statistics need is P @ F for a matrix F of 0/1 row features (below zero;
+below zero and cause A; ...; in band b and below zero), so all of them, for
+every setting, are one matrix product. A band median needs order statistics,
+not counts: the band's values are sorted once, P's columns are taken in that
+order and cumulated, and the median's two ranks are found for every setting
+with one searchsorted over the concatenated rows.
+
+The statistics are the ones below-zero/compute.py prints and
+months-of-cash-at-scale's band medians, with the same conventions (ECDF's
+linear interpolation; NaN out of medians, in share denominators). At the
+posts' own setting — tol 1000, guard 0, no bond add-back, the posts' bands,
+cut-offs -1 and -12 — every value is the one the scripts print. Guards must be
+>= 0 so a runway is always positive.
+
+The result is tidy: one row per (setting, statistic), with columns
+fasb_tol, cashexp_min, bond, stat, edges, band, cut, value. band is the band's
+label ("$500K-5M") for per-band rows and NaN otherwise; cut is the
+cut-off for "mild" and "deep". stats:
+
+  n            population size
+  below_zero   share with months <= 0 (overall, and per band of each edge set)
+  A, B, C      share of below-zero that is fully underwater (total NA < 0),
+               unrestricted deficit only, asset-rich reserve-poor
+  mild, deep   share of below-zero with months >= cut, < cut
+  median       median months, per band of each edge set
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from soilib.groups import band_codes
+
+FASB_TOLS = [0, 100, 1_000, 10_000, 100_000]
+CASHEXP_MINS = [0, 10_000, 50_000, 100_000, 250_000]
+BONDS = [False, True]
+EDGES = {"posts": [0, 5e5, 5e6, 5e7, np.inf],
+         "fine": [0, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, np.inf]}
+MILD = [-0.5, -1, -2]
+DEEP = [-6, -12, -24]
+
+
+def _months(df, bond):
+    """honest (or honest_bond) wherever cashexp > 0, with reserve.metrics'
+    operations in its order; NaN elsewhere."""
+    col = lambda c: df[c].to_numpy(dtype=float)
+    cashexp = col("totfuncexpns") - col("deprcatndepletn")
+    out = np.full(len(df), np.nan)
+    idx = np.flatnonzero(cashexp > 0)
+    monthly = cashexp[idx] / 12.0
+    num = col("unrstrctnetasstsend")[idx] - col("lndbldgsequipend")[idx]
+    num += col("secrdmrtgsend")[idx]
+    if bond:
+        num += col("txexmptbndsend")[idx]
+    out[idx] = num / monthly
+    return out
+
+
+def _medians(P, x, codes, k):
+    """Median of x within each band 0..k-1, for every row (setting) of P."""
+    out = np.full((len(P), k), np.nan)
+    for b in range(k):
+        rows = np.flatnonzero((codes == b) & ~np.isnan(x))
+        if not len(rows):
+            continue
+        rows = rows[np.argsort(x[rows], kind="stable")]
+        v, L = x[rows], len(rows)
+        cum = np.cumsum(P[:, rows], axis=1, dtype=np.int64)   # settings x band rows
+        m = cum[:, -1]
+        # Each row of cum is ascending and <= L, so offsetting row i by i * (L + 1)
+        # makes the whole array ascending: one searchsorted finds, for every
+        # setting, the position of its r-th included value.
+        off = np.arange(len(P)) * (L + 1)
+        flat = (cum + off[:, None]).ravel()
+
+        def nth(r):
+            return v[np.clip(np.searchsorted(flat, off + r) - np.arange(len(P)) * L, 0, L - 1)]
+
+        # ECDF.quantile(0.5): virtual rank (m - 1) / 2, a and b either side of it
+        lo = (m - 1) // 2
+        t = np.where((m - 1) % 2, 0.5, 0.0)
+        a, c = nth(lo + 1), nth(np.minimum(lo + 2, m))
+        diff = c - a
+        out[:, b] = np.where(m > 0, np.where(t >= 0.5, c - diff * (1 - t), a + diff * t), np.nan)
+    return out
+
+
+def _money(x):
+    for scale, unit in ((1e6, "M"), (1e3, "K")):
+        if x >= scale:
+            return f"${x / scale:g}{unit}"
+    return f"${x:g}"
+
+
+def _label(lo, hi):
+    """"$500K-5M", "$50M+": the posts' way of naming a band."""
+    return f"{_money(lo)}+" if np.isinf(hi) else f"{_money(lo)}-{_money(hi)[1:]}"
+
+
+def sweep(df, fasb_tol=FASB_TOLS, cashexp_min=CASHEXP_MINS, bond=BONDS,
+          edges=EDGES, mild=MILD, deep=DEEP):
+    """The statistics above for every (fasb_tol, cashexp_min, bond) and, within
+    each, every edge set and cut-off. `df` is the reserve table (reserve.load).
+    Returns the tidy table."""
+    if min(cashexp_min) < 0:
+        raise ValueError("cashexp_min must be >= 0 (a runway must be positive)")
+    c3 = df[df.subseccd == 3]
+    col = lambda c: c3[c].to_numpy(dtype=float)
+    dev = np.abs(col("unrstrctnetasstsend") + col("temprstrctnetasstsend")
+                 + col("permrstrctnetasstsend") - col("totnetassetend"))
+    cashexp = col("totfuncexpns") - col("deprcatndepletn")
+    settings = list(itertools.product(fasb_tol, cashexp_min))
+    tols = np.array([s[0] for s in settings], dtype=float)[:, None]
+    mins = np.array([s[1] for s in settings], dtype=float)[:, None]
+    P = (dev[None] <= tols) & (cashexp[None] > mins)              # settings x rows
+    Pf = P.astype(np.float32)                                     # counts < 2**24: exact
+    underwater = col("totnetassetend") < 0
+    unrest_def = ~underwater & (col("unrstrctnetasstsend") < 0)
+    asset_rich = ~underwater & (col("unrstrctnetasstsend") >= 0)
+    bands = {name: band_codes(col("totfuncexpns"), e) for name, e in edges.items()}
+
+    records = []
+    n = P.sum(axis=1)
+    for bd in bond:
+        x = _months(c3, bd)
+        neg = x <= 0
+        feats = {"below_zero": neg, "A": neg & underwater, "B": neg & unrest_def,
+                 "C": neg & asset_rich}
+        feats.update({("mild", c): neg & (x >= c) for c in mild})
+        feats.update({("deep", c): neg & (x < c) for c in deep})
+        for name, codes in bands.items():
+            for b in range(len(edges[name]) - 1):
+                feats[("band_n", name, b)] = codes == b
+                feats[("band_neg", name, b)] = neg & (codes == b)
+        keys = list(feats)
+        F = np.column_stack([feats[k] for k in keys]).astype(np.float32)
+        C = dict(zip(keys, (Pf @ F).T.round().astype(np.int64)))
+        nneg = C["below_zero"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i, (tol, g) in enumerate(settings):
+                row = {"fasb_tol": tol, "cashexp_min": g, "bond": bd}
+                records.append({**row, "stat": "n", "value": float(n[i])})
+                records.append({**row, "stat": "below_zero", "value": nneg[i] / n[i]})
+                for s in "ABC":
+                    records.append({**row, "stat": s, "value": C[s][i] / nneg[i]})
+                for kind, cuts in (("mild", mild), ("deep", deep)):
+                    for c in cuts:
+                        records.append({**row, "stat": kind, "cut": c,
+                                        "value": C[(kind, c)][i] / nneg[i]})
+        for name, codes in bands.items():
+            e = edges[name]
+            med = _medians(P, x, codes, len(e) - 1)
+            for i, (tol, g) in enumerate(settings):
+                row = {"fasb_tol": tol, "cashexp_min": g, "bond": bd, "edges": name}
+                for b in range(len(e) - 1):
+                    band = _label(e[b], e[b + 1])
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        share = C[("band_neg", name, b)][i] / C[("band_n", name, b)][i]
+                    records.append({**row, "stat": "below_zero", "band": band, "value": share})
+                    records.append({**row, "stat": "median", "band": band, "value": med[i, b]})
+    cols = ["fasb_tol", "cashexp_min", "bond", "stat", "edges", "band", "cut", "value"]
+    return pd.DataFrame.from_records(records, columns=cols)
@@ -58,7 +58,7 @@ noisier than the rest.
 
 RUN
 ---
-  python3 compute.py            # needs openpyxl
+  python3 compute.py            # needs openpyxl (first run on a workbook)
 Deterministic; no random seed needed. Writes results.json for figures.py and
 prints a check line for every IRS-derived number quoted in the post. (Survey
 figures quoted from the Urban Institute are cited, not ingested, and are not
@@ -67,8 +67,10 @@ checked here.)
 
 import json
 import pathlib
+import sys
 
-import openpyxl
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import soitable
 
 DATA = pathlib.Path(__file__).resolve().parent.parent / "data"
 OUT = pathlib.Path(__file__).resolve().parent
@@ -85,27 +87,12 @@ def check(label, got, want, tol):
     return got
 
 
-def read_table(path, ncols):
-    """Row label -> list of column values (col 2 .. col 1+ncols), from row 6."""
-    wb = openpyxl.load_workbook(path, data_only=True)
-    ws = wb["Sheet1"]
-    rows = {}
-    for r in range(6, ws.max_row + 1):
-        lab = ws.cell(r, 1).value
-        if lab is None:
-            continue
-        vals = [ws.cell(r, c).value for c in range(2, 2 + ncols)]
-        if any(v is not None for v in vals):
-            rows[str(lab).strip()] = vals
-    return rows
-
-
 # -------------------------------------------------- Table 1: by asset size --
 # Columns: Total, <$100k, $100k-500k, $500k-1M, $1M-10M, $10M-50M, >=$50M.
 # Published in thousands of dollars; ratios are unit-free, dollar figures are
 # converted to $B where quoted.
 
-t1 = read_table(DATA / "22eo01.xlsx", 7)
+t1 = soitable.Table(DATA / "22eo01.xlsx", first=6).rows(7)
 SIZES = ["total", "lt100k", "100k_500k", "500k_1m", "1m_10m", "10m_50m", "ge50m"]
 
 N = t1["Number of returns"]
@@ -170,7 +157,7 @@ check("sector: everything-else % of revenue", oth_pct[0], 5.4, 0.05)
 check("sector: non-gov contributions % of revenue", priv_pct[0], 14.9, 0.05)
 
 # ------------------------------------------------ Table 3: by code section --
-t3 = read_table(DATA / "22eo03.xlsx", 8)
+t3 = soitable.Table(DATA / "22eo03.xlsx", first=6).rows(8)
 SECS = ["total", "c3", "c4", "c5", "c6", "c7", "c8", "c9"]
 REV3 = t3["Total revenue"]
 GOV3 = t3["Government grants (contributions)"]
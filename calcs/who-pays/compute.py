@@ -29,20 +29,32 @@ Two populations, deliberately distinct:
 
 The [0,100] restriction drops ~7,320 orgs whose offsetting negative revenue
 lines (investment losses, net rental/sales losses) push the ratio out of range.
+
+`python3 compute.py --explore` also prints figures the spec does not check:
+the Gini and Theil indices of POP_REV's revenue.
 """
 
 import json
+import pathlib
+import sys
+
 import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import intermediate, populations, reserve, session
+from soilib.concentration import Concentration, top_rows
+from soilib.ecdf import ECDF
+from soilib.groups import Groups
+
 SRC = "../data/24eoextract990.csv"
 
 COLS = ["EIN", "tax_pd", "subseccd", "totrevenue", "totcntrbgfts",
-        "totprgmrevnue", "invstmntinc", "totfuncexpns", "deprcatndepletn",
-        "unrstrctnetasstsend", "temprstrctnetasstsend", "permrstrctnetasstsend",
-        "lndbldgsequipend", "secrdmrtgsend", "totnetassetend", "totassetsend",
+        "totprgmrevnue", "invstmntinc", "totassetsend",
         "nonpfrea", "operatehosptlcd", "operateschools170cd"]
 
+EXPLORE = "--explore" in sys.argv[1:]     # unchecked extras; see the docstring
+
 FAILURES = []
 
 
@@ -55,11 +67,21 @@ def check(label, got, want, tol):
         FAILURES.append(f"{label}: got {got:,.4f}, spec says {want:,.4f}")
 
 
-df = pd.read_csv(SRC, usecols=COLS)
-df = df.sort_values("tax_pd").drop_duplicates("EIN", keep="last")
+df = session.latest(SRC, COLS)
+
+# POP_REV, POP_MIX and POP_RESERVE are named row sets of this one frame
+# (../soilib/populations.py: "rev", "mix", "mix_reserve"); each is gathered
+# with only the columns it needs, never filtered and copied whole. in_pop and
+# honest come from the reserve table (FASB mask, cashexp > 0, honest months:
+# ../soilib/reserve.py, shared with months-of-cash-at-scale and below-zero),
+# one row per EIN of the same deduped extract.
+RESERVE = reserve.load(SRC).set_index("EIN")
+df["in_pop"] = RESERVE.in_pop.reindex(df.EIN, fill_value=False).to_numpy()
+df["honest"] = RESERVE.honest.reindex(df.EIN).to_numpy()
+pop = populations.Populations(df)
 
 # ---- POP_REV: aggregate dollars and concentration ----------------------
-rev = df[(df.subseccd == 3) & (df.totrevenue > 0)].copy()
+rev = pop.select("rev", ["totrevenue", "totcntrbgfts", "totprgmrevnue", "invstmntinc"])
 for c in ("totcntrbgfts", "totprgmrevnue", "invstmntinc"):
     rev[c] = rev[c].fillna(0)
 
@@ -79,27 +101,34 @@ check("investment % of revenue", invst / TOT * 100, 2.38, 0.05)
 check("residual $B", residual / 1e9, 113.1, 0.5)
 check("residual % of revenue", residual / TOT * 100, 3.65, 0.05)
 
-srt = rev.sort_values("totrevenue")
+# One partial sort for every rank at once (../soilib/concentration.py): the
+# top 1% / 10% are the len // 100 / len // 10 largest, the bottom 50% the
+# len // 2 smallest, exactly as a full sort's tail() and head() would take.
+CONC = Concentration(rev.totrevenue, top=(.01, .1), bottom=(.5,))
 print("\nPOP_REV — concentration")
-check("top 1% share of revenue", srt.totrevenue.tail(len(srt) // 100).sum() / TOT * 100, 69.1, 0.15)
-check("top 10% share of revenue", srt.totrevenue.tail(len(srt) // 10).sum() / TOT * 100, 91.8, 0.15)
-check("bottom 50% share of revenue", srt.totrevenue.head(len(srt) // 2).sum() / TOT * 100, 0.94, 0.05)
+check("top 1% share of revenue", CONC.top[.01] * 100, 69.1, 0.15)
+check("top 10% share of revenue", CONC.top[.1] * 100, 91.8, 0.15)
+check("bottom 50% share of revenue", CONC.bottom[.5] * 100, 0.94, 0.05)
+if EXPLORE:
+    print(f"  Gini {CONC.gini:.3f}, Theil {CONC.theil:.2f} (--explore; not checked)")
 
 # ---- POP_MIX: per-org distribution -------------------------------------
-rev["cs"] = rev.totcntrbgfts / rev.totrevenue * 100
-mix = rev[rev.cs.between(0, 100)].copy()
+mix = pop.select("mix", ["totrevenue", "totcntrbgfts", "totassetsend", "nonpfrea",
+                         "operatehosptlcd", "operateschools170cd", "honest"])
+mix["cs"] = mix.totcntrbgfts.fillna(0) / mix.totrevenue * 100
 MIXTOT = mix.totrevenue.sum()          # NB: POP_MIX's own revenue, not TOT
 
 print("\nPOP_MIX — per-organization")
 check("n POP_MIX", len(mix), 242_348, 0)
 check("mean contribution share", mix.cs.mean(), 56.0, 0.1)
-check("median contribution share", mix.cs.median(), 65.1, 0.1)
-check("p25 contribution share", mix.cs.quantile(.25), 12.5, 0.1)
-check("p75 contribution share", mix.cs.quantile(.75), 96.6, 0.1)
-check("% >=90 donation-funded", (mix.cs >= 90).mean() * 100, 33.7, 0.1)
-check("% <=10 fee-funded", (mix.cs <= 10).mean() * 100, 23.4, 0.1)
-check("exactly 0% contributions", (mix.cs == 0).sum(), 26_657, 0)
-check("exactly 100% contributions", (mix.cs >= 99.999).sum(), 25_366, 0)
+CS = ECDF(mix.cs)                      # sorted once; the checks below are lookups
+check("median contribution share", CS.median(), 65.1, 0.1)
+check("p25 contribution share", CS.quantile(.25), 12.5, 0.1)
+check("p75 contribution share", CS.quantile(.75), 96.6, 0.1)
+check("% >=90 donation-funded", CS.share(">=", 90) * 100, 33.7, 0.1)
+check("% <=10 fee-funded", CS.share("<=", 10) * 100, 23.4, 0.1)
+check("exactly 0% contributions", CS.count("==", 0), 26_657, 0)
+check("exactly 100% contributions", CS.count(">=", 99.999), 25_366, 0)
 
 fee, don, mid = mix[mix.cs <= 10], mix[mix.cs >= 90], mix[mix.cs.between(10, 90)]
 print("\nPOP_MIX — three groups (revenue shares are WITHIN POP_MIX)")
@@ -122,45 +151,41 @@ check("don median assets", don.totassetsend.median(), 512_764, 1)
 check("MECHANISM: fee:don median revenue ratio", fee.totrevenue.median() / don.totrevenue.median(), 1.25, 0.05)
 
 # ---- POP_MIX: deciles ---------------------------------------------------
-mix["dec"] = pd.qcut(mix.totrevenue, 10, labels=False)
-dec_med = mix.groupby("dec").cs.median()
+by_dec = Groups.tiles(mix.totrevenue, 10)       # pd.qcut(..., 10, labels=False)
+mix["dec"] = by_dec.codes
+dec_med = by_dec.quantiles(mix.cs, .5)
 print("\nPOP_MIX — deciles (flat 1-9, cliff at 10)")
 for i, want in enumerate([55.3, 63.0, 73.7, 73.3, 70.2, 71.1, 70.2, 69.9, 65.8, 23.4]):
-    check(f"decile {i+1} median contribution share", dec_med.loc[i], want, 0.15)
+    check(f"decile {i+1} median contribution share", dec_med[i], want, 0.15)
 
-top1 = mix.nlargest(int(len(mix) * 0.01), "totrevenue")
+top1 = mix.take(top_rows(mix.totrevenue, int(len(mix) * 0.01)))   # = nlargest
 check("top 1% n", len(top1), 2_423, 0)
 check("top 1% median contribution share", top1.cs.median(), 2.0, 0.15)
 check("top 1% % fee-funded", (top1.cs <= 10).mean() * 100, 68.9, 0.2)
 
 # ---- POP_MIX: nonpfrea --------------------------------------------------
-mix["npr"] = pd.to_numeric(mix.nonpfrea, errors="coerce")
+mix["npr"] = mix.nonpfrea.astype(float)   # numeric for mix.csv.gz; NaN = no code
 print("\nPOP_MIX — nonpfrea (the distinction already in the file)")
-for code, n_want, med_want in [(7, 107_177, 87.0), (9, 92_654, 42.2), (2, 15_473, 17.4),
-                               (12, 8_487, 4.0), (1, 4_638, 99.7), (3, 3_546, 1.4),
-                               (13, 2_402, 1.2), (14, 2_279, 5.0), (8, 1_692, 80.4),
-                               (15, 1_449, 0.0), (6, 1_430, 73.4)]:
-    g = mix[mix.npr == code]
-    check(f"nonpfrea {code:>2} n", len(g), n_want, 0)
-    check(f"nonpfrea {code:>2} median contribution share", g.cs.median(), med_want, 0.15)
-
-hosp = mix[mix.operatehosptlcd == "Y"]
-sch = mix[mix.operateschools170cd == "Y"]
+NPR_WANT = [(7, 107_177, 87.0), (9, 92_654, 42.2), (2, 15_473, 17.4),
+            (12, 8_487, 4.0), (1, 4_638, 99.7), (3, 3_546, 1.4),
+            (13, 2_402, 1.2), (14, 2_279, 5.0), (8, 1_692, 80.4),
+            (15, 1_449, 0.0), (6, 1_430, 73.4)]
+by_npr = Groups.keys(mix.npr, [code for code, _, _ in NPR_WANT])
+for (code, n_want, med_want), e in zip(NPR_WANT, by_npr.ecdfs(mix.cs)):
+    check(f"nonpfrea {code:>2} n", len(e), n_want, 0)
+    check(f"nonpfrea {code:>2} median contribution share", e.median(), med_want, 0.15)
+
+hosp = mix[mix.operatehosptlcd]
+sch = mix[mix.operateschools170cd]
 check("hospital-flag n", len(hosp), 2_235, 0)
 check("hospital-flag median contribution share", hosp.cs.median(), 1.1, 0.15)
 check("school-flag n", len(sch), 15_187, 0)
 check("school-flag median contribution share", sch.cs.median(), 17.6, 0.15)
 
 # ---- POP_RESERVE: the inverted U ---------------------------------------
-fasb = (df.unrstrctnetasstsend + df.temprstrctnetasstsend
-        + df.permrstrctnetasstsend - df.totnetassetend).abs() <= 1000
-d2 = df[(df.subseccd == 3) & (df.totrevenue > 0)].copy()
-d2["cashexp"] = d2.totfuncexpns - d2.deprcatndepletn
-d2 = d2[fasb.reindex(d2.index).fillna(False) & (d2.cashexp > 0)].copy()
-d2["honest"] = (d2.unrstrctnetasstsend - d2.lndbldgsequipend
-                + d2.secrdmrtgsend) / (d2.cashexp / 12.0)
-d2["cs"] = d2.totcntrbgfts.fillna(0) / d2.totrevenue * 100
-res = d2[d2.cs.between(0, 100)].copy()
+# The POP_MIX rows in the reserve population, by position in the mix frame.
+AT = pop.rows("mix_reserve", within="mix")
+res = mix[["cs", "honest"]].take(AT)
 
 # Bands MUST be built with pd.cut exactly as below. pd.cut is RIGHT-closed:
 # include_lowest makes the first interval [0,10] and the rest (10,25], (25,50]…
@@ -171,9 +196,9 @@ BINS = [0, 10, 25, 50, 75, 90, 100.01]
 LABS = ["0-10", "10-25", "25-50", "50-75", "75-90", "90-100"]
 res["band"] = pd.cut(res.cs, bins=BINS, labels=LABS, include_lowest=True)
 # band_idx is the same cut as an integer 0-5. figures.py runs in an env with
-# matplotlib but NO pandas (see its docstring) and reads this file with
-# np.genfromtxt, which needs every column numeric — so the band crosses the
-# boundary as an index into LABS, not as a string.
+# matplotlib but NO pandas (see its docstring) and reads this table as float
+# columns (mix.npy, or np.genfromtxt on mix.csv.gz), so every column must be
+# numeric — the band crosses the boundary as an index into LABS, not a string.
 res["band_idx"] = pd.cut(res.cs, bins=BINS, labels=False, include_lowest=True)
 
 WANT = [("0-10", 43_898, 5.18, 21.5), ("10-25", 16_345, 5.83, 14.9),
@@ -181,27 +206,29 @@ WANT = [("0-10", 43_898, 5.18, 21.5), ("10-25", 16_345, 5.83, 14.9),
         ("75-90", 22_350, 9.48, 9.4), ("90-100", 64_841, 5.37, 12.1)]
 print("\nPOP_RESERVE — the inverted U")
 check("n POP_RESERVE", len(res), 195_437, 0)
-for lab, n_want, med_want, bz_want in WANT:
-    g = res[res.band == lab]
-    check(f"band {lab} n", len(g), n_want, 0)
-    check(f"band {lab} median honest months", g.honest.median(), med_want, 0.03)
-    check(f"band {lab} % below zero", (g.honest <= 0).mean() * 100, bz_want, 0.1)
+by_band = Groups(res.band_idx, len(LABS))      # the pd.cut above, as codes
+bz = by_band.share(res.honest <= 0)
+for i, ((lab, n_want, med_want, bz_want), e) in enumerate(zip(WANT, by_band.ecdfs(res.honest))):
+    check(f"band {lab} n", len(e), n_want, 0)
+    check(f"band {lab} median honest months", e.median(), med_want, 0.03)
+    check(f"band {lab} % below zero", bz[i] * 100, bz_want, 0.1)
 
 # ---- write intermediates ------------------------------------------------
 # The band is assigned here, not recomputed in figures.py — arithmetic lives in
 # exactly one file, so a figure tweak can never move a number. Every column is
-# numeric so np.genfromtxt can read it; see the band_idx note above.
-out = mix[["EIN", "cs", "totrevenue", "npr", "dec"]].copy()
-out = out.merge(res[["EIN", "honest", "band_idx"]], on="EIN", how="left")
-out = out[["cs", "totrevenue", "npr", "dec", "honest", "band_idx"]]
-out.to_csv("mix.csv.gz", index=False, compression="gzip")
+# numeric so figures.py can read it without pandas; see the band_idx note.
+out = mix[["cs", "totrevenue", "npr", "dec"]].reset_index(drop=True)
+for c in ("honest", "band_idx"):       # POP_RESERVE columns; NaN elsewhere in POP_MIX
+    out[c] = np.nan
+    out.loc[AT, c] = res[c].to_numpy()
+intermediate.save("mix", out)
 
 with open("agg.json", "w") as f:
     json.dump({"n_pop_rev": int(len(rev)), "total_revenue": float(TOT),
                "contrib": float(contrib), "prgm": float(prgm),
                "invst": float(invst), "residual": float(residual)}, f, indent=2)
 
-print(f"\nwrote mix.csv.gz ({len(out):,} rows) and agg.json")
+print(f"\nwrote mix.csv.gz + mix.npy ({len(out):,} rows) and agg.json")
 if FAILURES:
     print(f"\n{len(FAILURES)} SPEC MISMATCH(ES) — the script is wrong, not the spec:")
     for f_ in FAILURES:
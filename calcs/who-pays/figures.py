@@ -4,12 +4,13 @@
 
 NO PANDAS — deliberately. compute.py runs under an env with pandas; this runs
 under one with matplotlib (the two are not the same env on this machine, same
-as the below-zero sibling). Hence np.genfromtxt and an all-numeric mix.csv.gz.
+as the below-zero sibling). Hence an all-numeric mix table, read with
+../soilib/intermediate.py (numpy only): mix.npy memory-mapped, or mix.csv.gz.
 
 Run with an interpreter that has matplotlib, e.g.
   /opt/homebrew/Caskroom/miniforge/base/envs/qchem/bin/python figures.py
 
-Reads mix.csv.gz + agg.json (written by compute.py). Writes:
+Reads mix + agg.json (written by compute.py). Writes:
   images/2026-07-14-nobodys-average-hero.png        Figure 1 (1200x630 hero/OG)
   images/2026-07-14-nobodys-average-bimodal.png     Figure 2
   images/2026-07-14-nobodys-average-by-size.png     Figure 3
@@ -17,10 +18,16 @@ Reads mix.csv.gz + agg.json (written by compute.py). Writes:
 """
 
 import json
+import pathlib
+import sys
+
 import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from soilib import intermediate
+
 INK = "#143f33"
 TEAL = "#2f7da3"
 TEAL_LIFT = "#5b9fc0"
@@ -38,7 +45,7 @@ mpl.rcParams.update({
 
 OUT = "../../images/2026-07-14-nobodys-average-{}.png"
 
-mix = np.genfromtxt("mix.csv.gz", delimiter=",", names=True)
+mix = intermediate.load("mix")
 agg = json.load(open("agg.json"))
 
 cs = mix["cs"]